@@ -2,6 +2,7 @@
 
 # Порядок вызова методов важен: limit() и offset() должны идти после order_by()
 # Для больших offset используйте ключевой набор (keyset pagination) вместо offset (об этом на следующем шаге)
+# Готовая реализация keyset-пагинации для наших моделей: src/queries/pagination.py (paginate)
 # В сочетании с offset() всегда используйте order_by() для стабильных результатов
 # limit(0) вернет пустой результат (полезно для тестирования)
 
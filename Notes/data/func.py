@@ -4,10 +4,10 @@
 
 # Для использования функций SQL в запросах (при Core-подходе), мы должны импортировать модуль func:
 
-from sqlalchemy import func, select, create_engine
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from src.config.url import DB_URL
+from src.config.engine import get_engine
 from src.models import Owners
 
 # Наиболее часто используемые функции из func:
@@ -29,7 +29,7 @@ func.substring()    # Извлечение подстроки.
 # Рекомендую использовать вызов функций, так как указано в примере выше - с использованием имени библиотеки. Иначе высока вероятность переопределения функции из одного модуля функцией с аналогичным именем из другого модуля.
 
 # Пример запроса:
-engine = create_engine(DB_URL.get('postgresql'), echo=True)
+engine = get_engine('postgresql')
 session = Session(engine)
 
 stmt = select(
@@ -2,13 +2,13 @@
 
 # Для начала нам надо импортировать соответствующий объект:
 
-from sqlalchemy import insert, create_engine
+from sqlalchemy import insert
 from sqlalchemy.orm import  Session
 
-from src.config.url import DB_URL
+from src.config.engine import get_engine
 from src.models import Owners, Species, Pets, Base
 
-engine = create_engine(DB_URL.get('postgresql'), echo=True)
+engine = get_engine('postgresql')
 Base.metadata.create_all(engine)
 session = Session(engine)
 
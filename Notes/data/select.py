@@ -1,12 +1,12 @@
 # По аналогии с insert, всё начинается с импорта объекта:
 
-from sqlalchemy import select, create_engine
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from src.config.url import DB_URL
+from src.config.engine import get_engine
 from src.models import Owners
 
-engine = create_engine(DB_URL.get('postgresql'), echo=True)
+engine = get_engine('postgresql')
 
 with Session(engine) as session: # При помощи контекстного менеджера открываем сессию
     request = select(Owners.owner_id, Owners.owner_name) # Формируем запрос используя метод select, указываем какие данные хотим получить и откуда
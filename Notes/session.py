@@ -2,15 +2,14 @@
 # Если говорить упрощенно, то Сессии отслеживают изменения, сделанные в рамках одной транзакции, а затем обрабатывают их: группируют повторяющиеся операции, выполняют топологическую сортировку по зависимостям и т.д. А затем выполняют их в базе.
 
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
-from src.config.url import DB_URL
+from src.config.engine import get_engine
 from src.models import Owners
 
 
 try:
-        engine = create_engine(DB_URL.get('postgresql'), echo=True)
+        engine = get_engine('postgresql')
         session = Session(engine)
 
         owner1 = Owners(
@@ -2,10 +2,12 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 
 from alembic import context
 
 from src.models.base import Base
+from src.reporting.rollups import metadata as reporting_metadata
 
 
 # this is the Alembic Config object, which provides
@@ -23,12 +25,40 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip reporting rollups: they are managed by hand-written migrations
+    (a materialized view on PostgreSQL), not by autogenerate."""
+    table = object if type_ == "table" else getattr(object, "table", None)
+    return table is None or table.name not in reporting_metadata.tables
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
 
+def apply_timeouts(connection) -> None:
+    """Apply lock_timeout / statement_timeout given as -x options, e.g.
+    ``alembic -x lock_timeout=3s -x statement_timeout=5min upgrade head``
+    (PostgreSQL only). Online helpers for large tables are in
+    src/maintenance/online_migrations.py."""
+    if connection.dialect.name != "postgresql":
+        return
+    x_arguments = context.get_x_argument(as_dictionary=True)
+    for name in ("lock_timeout", "statement_timeout"):
+        if name in x_arguments:
+            connection.execute(
+                text("SELECT set_config(:name, :value, false)"),
+                {"name": name, "value": x_arguments[name]},
+            )
+    # SET выполнен в автоматически начатой транзакции - закрываем её,
+    # иначе Alembic не станет управлять транзакциями миграций сам
+    connection.commit()
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -47,6 +77,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -59,7 +90,22 @@ def run_migrations_online() -> None:
     In this scenario we need to create an Engine
     and associate a connection with the context.
 
+    A connection passed in config.attributes["connection"]
+    (e.g. from the test fixtures) is used as is.
+
     """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -67,8 +113,14 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        apply_timeouts(connection)
+        # Каждая ревизия в своей транзакции: блокировки не копятся
+        # до конца всего upgrade
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,205 @@
+"""indexes and foreign keys
+
+Revision ID: 9c1e5a7d3b42
+Revises: 4d9b3f2caa9b
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+import logging
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c1e5a7d3b42"
+down_revision: Union[str, None] = "4d9b3f2caa9b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger(f"alembic.runtime.migration.{revision}")
+
+
+# (имя индекса, таблица, столбцы)
+INDEXES = [
+    ("ix_pets_owner_id", "pets", ["owner_id"]),
+    ("ix_pets_species", "pets", ["species"]),
+    (
+        "ix_manipulation_facts_pet_id_begin_time",
+        "manipulation_facts",
+        ["pet_id", "begin_time"],
+    ),
+    (
+        "ix_manipulation_facts_manipulation_id",
+        "manipulation_facts",
+        ["manipulation_id"],
+    ),
+]
+
+# (имя ограничения, таблица, столбец, ссылочная таблица, ссылочный столбец)
+FOREIGN_KEYS = [
+    ("fk_pets_owner_id_owners", "pets", "owner_id", "owners", "owner_id"),
+    (
+        "fk_pets_species_species",
+        "pets",
+        "species",
+        "species",
+        "species_id",
+    ),
+    (
+        "fk_manipulation_facts_pet_id_pets",
+        "manipulation_facts",
+        "pet_id",
+        "pets",
+        "id",
+    ),
+    (
+        "fk_manipulation_facts_manipulation_id_manipulations",
+        "manipulation_facts",
+        "manipulation_id",
+        "manipulations",
+        "manipulation_id",
+    ),
+]
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _orphan_condition(
+    table: str, column: str, ref_table: str, ref_column: str
+) -> str:
+    return (
+        f"{column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {ref_table} "
+        f"WHERE {ref_table}.{ref_column} = {table}.{column})"
+    )
+
+
+def _check_orphans() -> None:
+    """Ссылки на несуществующие строки не пройдут VALIDATE CONSTRAINT.
+
+    Проверка выполняется до создания индексов: при ошибке база остаётся
+    как была. По умолчанию миграция останавливается с отчётом; с
+    ``-x orphans=nullify`` висячие ссылки в nullable-столбцах обнуляются
+    (с записью в лог). Ссылки в NOT NULL-столбцах исправляются вручную.
+    """
+    if context.is_offline_mode():
+        return
+    connection = op.get_bind()
+    nullify = (
+        context.get_x_argument(as_dictionary=True).get("orphans") == "nullify"
+    )
+    problems, fixes = [], []
+    for _, table, column, ref_table, ref_column in FOREIGN_KEYS:
+        condition = _orphan_condition(table, column, ref_table, ref_column)
+        count = connection.exec_driver_sql(
+            f"SELECT count(*) FROM {table} WHERE {condition}"
+        ).scalar()
+        if not count:
+            continue
+        values = connection.exec_driver_sql(
+            f"SELECT DISTINCT {column} FROM {table} WHERE {condition} "
+            "ORDER BY 1 LIMIT 10"
+        ).scalars().all()
+        nullable = next(
+            info["nullable"]
+            for info in sa.inspect(connection).get_columns(table)
+            if info["name"] == column
+        )
+        report = (
+            f"{table}.{column} -> {ref_table}.{ref_column}: {count} rows, "
+            f"missing values {values}"
+        )
+        if nullify and nullable:
+            fixes.append((report, table, column, condition))
+        else:
+            problems.append(report + ("" if nullable else " (NOT NULL)"))
+    if problems:
+        raise RuntimeError(
+            "rows reference missing parents, "
+            "foreign keys cannot be validated:\n  "
+            + "\n  ".join(problems)
+            + "\nfix the data or rerun with -x orphans=nullify "
+            "(nullable columns only); nothing has been changed"
+        )
+    for report, table, column, condition in fixes:
+        connection.exec_driver_sql(
+            f"UPDATE {table} SET {column} = NULL WHERE {condition}"
+        )
+        logger.warning("%s: set to NULL", report)
+
+
+def _has_constraint(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return bool(
+        op.get_bind().exec_driver_sql(
+            f"SELECT 1 FROM pg_constraint WHERE conname = '{name}'"
+        ).scalar()
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _is_postgresql():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+        for name, table, column, ref_table, ref_column in FOREIGN_KEYS:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.create_foreign_key(
+                    name, ref_table, [column], [ref_column]
+                )
+        return
+
+    _check_orphans()
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции,
+    # зато он не блокирует запись в таблицу на время построения.
+    # Индексы фиксируются сразу, поэтому IF NOT EXISTS: повторный
+    # запуск после ошибки на следующих шагах не падает на них.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+    # NOT VALID добавляет ограничение без полного сканирования таблицы
+    # под эксклюзивной блокировкой. VALIDATE проверяет существующие строки
+    # под SHARE UPDATE EXCLUSIVE, не мешая чтению и записи.
+    for name, table, column, ref_table, ref_column in FOREIGN_KEYS:
+        if _has_constraint(name):
+            continue
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+            f"FOREIGN KEY ({column}) REFERENCES {ref_table} ({ref_column}) "
+            "NOT VALID"
+        )
+    with op.get_context().autocommit_block():
+        for name, table, *_ in FOREIGN_KEYS:
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _is_postgresql():
+        for name, table, *_ in reversed(FOREIGN_KEYS):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_constraint(name, type_="foreignkey")
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
+        return
+
+    for name, table, *_ in reversed(FOREIGN_KEYS):
+        op.drop_constraint(name, table, type_="foreignkey")
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True
+            )
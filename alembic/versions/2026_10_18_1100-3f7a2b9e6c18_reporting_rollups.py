@@ -0,0 +1,89 @@
+"""reporting rollups
+
+Revision ID: 3f7a2b9e6c18
+Revises: 9c1e5a7d3b42
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f7a2b9e6c18"
+down_revision: Union[str, None] = "9c1e5a7d3b42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Только закрытые дни: текущий день src/reporting/rollups.py считает по живым данным
+DAILY_STATS_VIEW = """
+CREATE MATERIALIZED VIEW manipulation_daily_stats AS
+SELECT
+    CAST(manipulation_facts.begin_time AS DATE) AS day,
+    coalesce(pets.species, 0) AS species_id,
+    manipulation_facts.manipulation_id AS manipulation_id,
+    count(*) AS facts,
+    sum(CASE WHEN manipulation_facts.is_planned THEN 1 ELSE 0 END) AS planned,
+    count(manipulation_facts.end_time) AS finished,
+    coalesce(sum(CAST(EXTRACT(epoch FROM manipulation_facts.end_time
+                              - manipulation_facts.begin_time) AS FLOAT)), 0)
+        AS duration_seconds
+FROM manipulation_facts
+LEFT OUTER JOIN pets ON manipulation_facts.pet_id = pets.id
+WHERE manipulation_facts.begin_time < CURRENT_DATE
+GROUP BY
+    CAST(manipulation_facts.begin_time AS DATE),
+    coalesce(pets.species, 0),
+    manipulation_facts.manipulation_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "report_watermarks",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("through", sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(DAILY_STATS_VIEW)
+        # Уникальный индекс нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+        op.create_index(
+            "ux_manipulation_daily_stats",
+            "manipulation_daily_stats",
+            ["day", "species_id", "manipulation_id"],
+            unique=True,
+        )
+        op.execute(
+            "INSERT INTO report_watermarks (name, through) "
+            "VALUES ('manipulation_daily_stats', CURRENT_DATE)"
+        )
+        return
+
+    # На SQLite - сводная таблица, её наполняет refresh()
+    op.create_table(
+        "manipulation_daily_stats",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("species_id", sa.Integer(), nullable=False),
+        sa.Column("manipulation_id", sa.Integer(), nullable=False),
+        sa.Column("facts", sa.Integer(), nullable=False),
+        sa.Column("planned", sa.Integer(), nullable=False),
+        sa.Column("finished", sa.Integer(), nullable=False),
+        sa.Column("duration_seconds", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "species_id", "manipulation_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP MATERIALIZED VIEW manipulation_daily_stats")
+    else:
+        op.drop_table("manipulation_daily_stats")
+    op.drop_table("report_watermarks")
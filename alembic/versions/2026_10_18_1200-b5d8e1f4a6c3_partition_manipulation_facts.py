@@ -0,0 +1,187 @@
+"""partition manipulation_facts by month
+
+Миграция с простоем: таблица переименовывается, копируется в новую
+секционированную, затем перестраиваются индексы и отчётное представление -
+всё в одной транзакции под ACCESS EXCLUSIVE на manipulation_facts.
+Чтение и запись таблицы стоят всё время копирования (порядка минут
+на десятки миллионов строк), поэтому запускать в окно обслуживания.
+
+Revision ID: b5d8e1f4a6c3
+Revises: 3f7a2b9e6c18
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5d8e1f4a6c3"
+down_revision: Union[str, None] = "3f7a2b9e6c18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Секционирование есть только в PostgreSQL; на остальных базах таблица остаётся обычной.
+# Первичный ключ секционированной таблицы обязан включать ключ секционирования,
+# поэтому в базе он (id, begin_time); уникальность id обеспечивает последовательность.
+# Строки вне помесячных секций (далёкие запланированные процедуры, задним числом,
+# месяцы, для которых maintain() из src/maintenance/partitions.py не запускался)
+# попадают в секцию manipulation_facts_default, а не отклоняются.
+
+COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('manipulation_facts_id_seq'),
+    pet_id integer NOT NULL,
+    manipulation_id integer NOT NULL,
+    is_planned boolean,
+    begin_time timestamp without time zone NOT NULL,
+    end_time timestamp without time zone,
+    result text
+"""
+
+FOREIGN_KEYS = """
+    CONSTRAINT fk_manipulation_facts_pet_id_pets
+        FOREIGN KEY (pet_id) REFERENCES pets (id),
+    CONSTRAINT fk_manipulation_facts_manipulation_id_manipulations
+        FOREIGN KEY (manipulation_id) REFERENCES manipulations (manipulation_id)
+"""
+
+# Помесячные секции от первой процедуры до трёх месяцев вперёд от последней
+# (или от текущей даты, если запланированных процедур в будущем нет)
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    first_month date := date_trunc('month', coalesce(
+        (SELECT min(begin_time) FROM manipulation_facts_legacy), now()))::date;
+    last_month date := (date_trunc('month', greatest(
+        (SELECT max(begin_time) FROM manipulation_facts_legacy), now()))
+        + interval '3 months')::date;
+    cur_month date := first_month;
+BEGIN
+    WHILE cur_month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF manipulation_facts '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'manipulation_facts_p' || to_char(cur_month, 'YYYY_MM'),
+            cur_month,
+            (cur_month + interval '1 month')::date
+        );
+        cur_month := (cur_month + interval '1 month')::date;
+    END LOOP;
+    CREATE TABLE manipulation_facts_default
+        PARTITION OF manipulation_facts DEFAULT;
+END $$
+"""
+
+DAILY_STATS_VIEW = """
+CREATE MATERIALIZED VIEW manipulation_daily_stats AS
+SELECT
+    CAST(manipulation_facts.begin_time AS DATE) AS day,
+    coalesce(pets.species, 0) AS species_id,
+    manipulation_facts.manipulation_id AS manipulation_id,
+    count(*) AS facts,
+    sum(CASE WHEN manipulation_facts.is_planned THEN 1 ELSE 0 END) AS planned,
+    count(manipulation_facts.end_time) AS finished,
+    coalesce(sum(CAST(EXTRACT(epoch FROM manipulation_facts.end_time
+                              - manipulation_facts.begin_time) AS FLOAT)), 0)
+        AS duration_seconds
+FROM manipulation_facts
+LEFT OUTER JOIN pets ON manipulation_facts.pet_id = pets.id
+WHERE manipulation_facts.begin_time < CURRENT_DATE
+GROUP BY
+    CAST(manipulation_facts.begin_time AS DATE),
+    coalesce(pets.species, 0),
+    manipulation_facts.manipulation_id
+"""
+
+
+def _swap_table(create_table: str, create_partitions: str | None) -> None:
+    # Отчётное представление ссылается на таблицу - пересоздаём его вокруг замены
+    op.execute("DROP MATERIALIZED VIEW manipulation_daily_stats")
+
+    op.execute(
+        "ALTER TABLE manipulation_facts RENAME TO manipulation_facts_legacy"
+    )
+    op.execute(
+        "ALTER INDEX manipulation_facts_pkey "
+        "RENAME TO manipulation_facts_legacy_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_manipulation_facts_pet_id_begin_time "
+        "RENAME TO ix_manipulation_facts_legacy_pet_id_begin_time"
+    )
+    op.execute(
+        "ALTER INDEX ix_manipulation_facts_manipulation_id "
+        "RENAME TO ix_manipulation_facts_legacy_manipulation_id"
+    )
+    # Последовательность принадлежит старому столбцу id и удалилась бы вместе с ним
+    op.execute("ALTER SEQUENCE manipulation_facts_id_seq OWNED BY NONE")
+
+    op.execute(create_table)
+    if create_partitions:
+        op.execute(create_partitions)
+    op.execute(
+        "INSERT INTO manipulation_facts "
+        "(id, pet_id, manipulation_id, is_planned, begin_time, end_time, "
+        "result) "
+        "SELECT id, pet_id, manipulation_id, is_planned, begin_time, "
+        "end_time, result FROM manipulation_facts_legacy"
+    )
+    op.execute("DROP TABLE manipulation_facts_legacy")
+    op.execute(
+        "ALTER SEQUENCE manipulation_facts_id_seq "
+        "OWNED BY manipulation_facts.id"
+    )
+
+    # Индексы строим после копирования данных - так быстрее
+    op.create_index(
+        "ix_manipulation_facts_pet_id_begin_time",
+        "manipulation_facts",
+        ["pet_id", "begin_time"],
+    )
+    op.create_index(
+        "ix_manipulation_facts_manipulation_id",
+        "manipulation_facts",
+        ["manipulation_id"],
+    )
+
+    op.execute(DAILY_STATS_VIEW)
+    op.create_index(
+        "ux_manipulation_daily_stats",
+        "manipulation_daily_stats",
+        ["day", "species_id", "manipulation_id"],
+        unique=True,
+    )
+    op.execute(
+        "UPDATE report_watermarks SET through = CURRENT_DATE "
+        "WHERE name = 'manipulation_daily_stats'"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    _swap_table(
+        f"CREATE TABLE manipulation_facts ({COLUMNS}, "
+        "CONSTRAINT manipulation_facts_pkey PRIMARY KEY (id, begin_time), "
+        f"{FOREIGN_KEYS}) PARTITION BY RANGE (begin_time)",
+        CREATE_PARTITIONS,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    # Секции удаляются вместе с секционированной таблицей
+    _swap_table(
+        f"CREATE TABLE manipulation_facts ({COLUMNS}, "
+        "CONSTRAINT manipulation_facts_pkey PRIMARY KEY (id), "
+        f"{FOREIGN_KEYS})",
+        None,
+    )
@@ -0,0 +1,140 @@
+from typing import Callable
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, lazyload
+
+from benchmarks.data import Scale, owner_rows
+from src.models import ManipulationFacts, Owners, Pets, Species
+from src.queries.pagination import encode_cursor, paginate
+from src.queries.projection import fetch_rows
+from src.queries.streaming import stream_partitions
+
+
+# Имя сценария -> функция(engine, scale), возвращающая число обработанных строк.
+# Сценарии выполняются в порядке объявления и не должны менять данные.
+CASES: dict[str, Callable[[Engine, Scale], int]] = {}
+
+PAGE_SIZE = 50
+INSERT_SAMPLE = 10000
+REPORT_LIMIT = 10000
+
+
+def case(name: str):
+    def decorator(fn):
+        CASES[name] = fn
+        return fn
+    return decorator
+
+
+def _owner_sample(scale: Scale) -> list[dict]:
+    names = ('owner_name', 'owner_phone', 'owner_email')
+    return [dict(zip(names, row)) for row, _ in zip(owner_rows(scale, seed=100), range(INSERT_SAMPLE))]
+
+
+@case('insert_orm_add_all')
+def insert_orm_add_all(engine: Engine, scale: Scale) -> int:
+    rows = _owner_sample(scale)
+    with Session(engine) as session:
+        session.add_all(Owners(**row) for row in rows)
+        session.flush()
+        session.rollback()
+    return len(rows)
+
+
+@case('insert_core_executemany')
+def insert_core_executemany(engine: Engine, scale: Scale) -> int:
+    rows = _owner_sample(scale)
+    with engine.connect() as connection:
+        connection.execute(insert(Owners), rows)
+        connection.rollback()
+    return len(rows)
+
+
+@case('join_owner_pets_species')
+def join_owner_pets_species(engine: Engine, scale: Scale) -> int:
+    stmt = (
+        select(Owners.owner_name, Pets.name, Species.species_name)
+        .join_from(Owners, Pets, Pets.owner_id == Owners.owner_id)
+        .join(Species, Pets.species == Species.species_id)
+    )
+    with engine.connect() as connection:
+        return len(connection.execute(stmt).all())
+
+
+@case('relationship_owners_pets')
+def relationship_owners_pets(engine: Engine, scale: Scale) -> int:
+    stmt = select(Owners).order_by(Owners.owner_id).limit(REPORT_LIMIT)
+    with Session(engine) as session:
+        owners = session.scalars(stmt).all()
+        return sum(len(owner.pets) for owner in owners)
+
+
+def _pets_report(scale: Scale):
+    return select(Pets).where(Pets.weight > 0).order_by(Pets.id).limit(REPORT_LIMIT)
+
+
+@case('projection_pets_orm')
+def projection_pets_orm(engine: Engine, scale: Scale) -> int:
+    # Полная гидратация объектов без связей: сравнение с projection_pets_rows
+    with Session(engine) as session:
+        return len(session.scalars(_pets_report(scale).options(lazyload('*'))).all())
+
+
+@case('projection_pets_rows')
+def projection_pets_rows(engine: Engine, scale: Scale) -> int:
+    with Session(engine) as session:
+        return len(fetch_rows(session, _pets_report(scale)))
+
+
+@case('pagination_offset_deep')
+def pagination_offset_deep(engine: Engine, scale: Scale) -> int:
+    stmt = (
+        select(ManipulationFacts)
+        .order_by(ManipulationFacts.id)
+        .limit(PAGE_SIZE)
+        .offset(max(scale.facts - PAGE_SIZE, 0))
+    )
+    with Session(engine) as session:
+        return len(session.scalars(stmt).all())
+
+
+@case('pagination_keyset_deep')
+def pagination_keyset_deep(engine: Engine, scale: Scale) -> int:
+    cursor = encode_cursor([max(scale.facts - PAGE_SIZE, 0)], 'next')
+    with Session(engine) as session:
+        return len(paginate(session, select(ManipulationFacts), [ManipulationFacts.id],
+                            page_size=PAGE_SIZE, cursor=cursor))
+
+
+@case('aggregation_by_manipulation')
+def aggregation_by_manipulation(engine: Engine, scale: Scale) -> int:
+    stmt = select(
+        ManipulationFacts.manipulation_id,
+        func.count(),
+        func.min(ManipulationFacts.begin_time),
+        func.max(ManipulationFacts.begin_time),
+    ).group_by(ManipulationFacts.manipulation_id)
+    with engine.connect() as connection:
+        connection.execute(stmt).all()
+    return scale.facts
+
+
+@case('aggregation_by_species')
+def aggregation_by_species(engine: Engine, scale: Scale) -> int:
+    stmt = (
+        select(Species.species_name, func.count(ManipulationFacts.id))
+        .join_from(ManipulationFacts, Pets, ManipulationFacts.pet_id == Pets.id)
+        .join(Species, Pets.species == Species.species_id)
+        .group_by(Species.species_name)
+    )
+    with engine.connect() as connection:
+        connection.execute(stmt).all()
+    return scale.facts
+
+
+@case('streaming_facts_orm')
+def streaming_facts_orm(engine: Engine, scale: Scale) -> int:
+    with Session(engine) as session:
+        return sum(len(partition) for partition in
+                   stream_partitions(session, select(ManipulationFacts), 5000, expunge=True))
@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timedelta
+from typing import Iterator
+
+
+SPECIES = ['Собака', 'Кошка', 'Попугай', 'Хомяк', 'Кролик']
+MANIPULATIONS = ['Первичный осмотр', 'Вакцинация', 'Стрижка когтей', 'Анализ крови', 'УЗИ', 'Чипирование']
+HISTORY_START = datetime(2015, 1, 1)
+HISTORY_DAYS = 365 * 10
+
+
+class Scale:
+    """
+    Размер синтетического набора данных.
+    scale - число записей manipulation_facts, остальные таблицы считаются от него.
+    """
+
+    def __init__(self, scale: int):
+        self.facts = scale
+        self.pets = max(scale // 10, 1)
+        self.owners = max(scale // 20, 1)
+
+    @property
+    def total(self) -> int:
+        return self.facts + self.pets + self.owners + len(SPECIES) + len(MANIPULATIONS)
+
+    def as_dict(self) -> dict:
+        return {'owners': self.owners, 'pets': self.pets, 'facts': self.facts, 'total': self.total}
+
+
+def species_rows() -> list[dict]:
+    return [{'species_id': i, 'species_name': name} for i, name in enumerate(SPECIES, 1)]
+
+
+def manipulation_rows() -> list[dict]:
+    return [{'manipulation_id': i, 'manipulation_name': name} for i, name in enumerate(MANIPULATIONS, 1)]
+
+
+def owner_rows(scale: Scale, seed: int = 0) -> Iterator[tuple]:
+    """ (owner_name, owner_phone, owner_email) """
+
+    rnd = random.Random(seed)
+    for i in range(1, scale.owners + 1):
+        yield f'Владелец {i}', f'+7{rnd.randrange(10 ** 9, 10 ** 10)}', f'owner{i}@mail.ru'
+
+
+def pet_rows(scale: Scale, seed: int = 1) -> Iterator[tuple]:
+    """ (species, owner_id, name, sex, weight, birthdate) """
+
+    rnd = random.Random(seed)
+    for i in range(1, scale.pets + 1):
+        yield (
+            rnd.randint(1, len(SPECIES)),
+            rnd.randint(1, scale.owners),
+            f'Питомец {i}',
+            rnd.choice('MF'),
+            round(rnd.uniform(0.1, 60), 2),
+            HISTORY_START - timedelta(days=rnd.randrange(0, 365 * 15)),
+        )
+
+
+def fact_rows(scale: Scale, seed: int = 2) -> Iterator[tuple]:
+    """ (pet_id, manipulation_id, is_planned, begin_time, end_time, result) в порядке времени начала """
+
+    rnd = random.Random(seed)
+    step = HISTORY_DAYS * 86400 / scale.facts
+    for i in range(scale.facts):
+        begin = HISTORY_START + timedelta(seconds=i * step)
+        yield (
+            rnd.randint(1, scale.pets),
+            rnd.randint(1, len(MANIPULATIONS)),
+            rnd.random() < 0.2,
+            begin,
+            begin + timedelta(minutes=rnd.randint(5, 120)),
+            'ok',
+        )
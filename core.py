@@ -1,7 +1,7 @@
-from sqlalchemy import create_engine, insert, select
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
-from src.config.url import DB_URL
+from src.config.engine import get_engine
 
 from src.models.base import Base
 from src.models.manipulations import Manipulations
@@ -14,14 +14,14 @@ from src.models.species import Species
 
 # # Добавление данных через ORM
 # try:
-#     engine = create_engine(DB_URL.get('postgresql'), echo=True)
+#     engine = get_engine('postgresql')
 #     Base.metadata.create_all(engine)
 # except Exception as e:
 #     print('Error!', e)
 #
 #
 # try:
-#         engine = create_engine(DB_URL.get('postgresql'), echo=True)
+#         engine = get_engine('postgresql')
 #         session = Session(engine)
 #
 #         owner1 = Owners(
@@ -57,7 +57,7 @@ from src.models.species import Species
 #
 # # Другой вариант создания записей в таблице - это использование конструктора SQL-выражений.
 # try:
-#     engine = create_engine(DB_URL.get('postgresql'), echo=True)
+#     engine = get_engine('postgresql')
 #     session = Session(engine)
 #     stmt_species= insert(Species).values(
 #         [
@@ -93,7 +93,7 @@ from src.models.species import Species
 
 
 
-# engine = create_engine(DB_URL.get('postgresql'), echo=True)
+# engine = get_engine('postgresql')
 # with Session(engine) as session:
 #     request = select(Owners.owner_id, Owners.owner_name)
 #     print('request:', request)
@@ -104,14 +104,4 @@ from src.models.species import Species
 #     print(row)
 
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from src.models import Base
-
-
-def db_session():
-    engine = create_engine("sqlite:///:memory:")  # БД в RAM
-    Base.metadata.create_all(engine)
-    yield sessionmaker(bind=engine)()
-    Base.metadata.drop_all(engine)
\ No newline at end of file
+# Тестовые сессии БД - фикстуры db_engine / db_connection / db_session в tests/conftest.py
\ No newline at end of file
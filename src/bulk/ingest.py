@@ -0,0 +1,163 @@
+import io
+from datetime import date, datetime, time
+from itertools import chain, islice
+from time import perf_counter
+from typing import Any, Iterable, Iterator, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Connection, Engine
+
+from src.cache.results import notify_write
+from src.config.engine import get_engine
+
+
+class IngestReport:
+    """ Итог пакетной загрузки """
+
+    def __init__(self, table: str, rows: int, batches: int, seconds: float, ids: list | None = None):
+        self.table = table
+        self.rows = rows
+        self.batches = batches
+        self.seconds = seconds
+        self.ids = ids
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return (f'<IngestReport {self.table}: {self.rows} rows in {self.batches} batches, '
+                f'{self.seconds:.3f}s, {self.rows_per_sec:.0f} rows/s>')
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    """ Разбивает поток строк на списки длиной не больше size """
+
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def default_columns(table) -> list[str]:
+    """ Столбцы для вставки по умолчанию: все, кроме автоинкрементного первичного ключа """
+
+    return [column.name for column in table.columns if column is not table.autoincrement_column]
+
+
+def _as_dicts(batch: list, columns: Sequence[str]) -> list[dict]:
+    return [row if isinstance(row, dict) else dict(zip(columns, row)) for row in batch]
+
+
+def _copy_value(value: Any) -> str:
+    # Формат CSV для COPY: NULL - пустое поле без кавычек, строки всегда в кавычках,
+    # поэтому пустая строка ('""') не превращается в NULL.
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_defaults(table, columns: Sequence[str]) -> dict[str, Any] | None:
+    """
+    Значения Column(default=...) для столбцов, которых нет в columns: INSERT через
+    SQLAlchemy подставляет их сам, а COPY - нет. None, если у такого столбца умолчание
+    вычисляется в Python (функция, Sequence) и COPY использовать нельзя.
+    """
+
+    defaults = {}
+    for column in table.columns:
+        if column.name in columns or column.default is None:
+            continue
+        if not column.default.is_scalar:
+            return None
+        defaults[column.name] = column.default.arg
+    return defaults
+
+
+def _copy_batch(connection: Connection, table, columns: Sequence[str], batch: list,
+                defaults: dict[str, Any] | None = None) -> None:
+    defaults = defaults or {}
+    buffer = io.StringIO()
+    for row in batch:
+        values = (row.get(name) for name in columns) if isinstance(row, dict) else row
+        buffer.write(','.join(map(_copy_value, chain(values, defaults.values()))))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    sql = f'COPY {table.name} ({", ".join(chain(columns, defaults))}) FROM STDIN WITH (FORMAT csv)'
+    with connection.connection.dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def bulk_insert(
+        model,
+        rows: Iterable[dict | tuple],
+        *,
+        columns: Sequence[str] | None = None,
+        batch_size: int = 10000,
+        returning: bool = False,
+        use_copy: bool | None = None,
+        key: str = 'postgresql',
+        engine: Engine | None = None,
+) -> IngestReport:
+    """
+    Потоковая вставка строк (словарей или кортежей) пачками по batch_size в одной транзакции.
+
+    На PostgreSQL с psycopg2 строки передаются через COPY FROM STDIN, на остальных
+    базах - через executemany / insertmanyvalues. COPY не умеет возвращать ключи,
+    поэтому при returning=True используется INSERT ... RETURNING. Умолчания столбцов
+    (Column(default=...)), которых нет в строках, подставляются в данные COPY;
+    если умолчание вычисляется в Python, вставка идёт через INSERT.
+    columns задаёт порядок значений в кортежах, по умолчанию - default_columns().
+    engine, если передан, используется вместо общего движка для key.
+    """
+
+    table = model.__table__
+    engine = engine or get_engine(key)
+    if use_copy is None:
+        use_copy = engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+    use_copy = use_copy and not returning
+
+    ids = [] if returning else None
+    count = batches = 0
+    started = perf_counter()
+    stmt = sort_ids = defaults = None
+
+    with engine.begin() as connection:
+        for batch in batched(rows, batch_size):
+            if columns is None:
+                first = batch[0]
+                columns = list(first) if isinstance(first, dict) else default_columns(table)
+            if stmt is None:
+                # sort_by_parameter_order на SQLite выполняет INSERT построчно. Ключи,
+                # которые выдаёт база, внутри одного INSERT идут подряд (запись в БД
+                # сериализована), поэтому порядок строк восстанавливается сортировкой.
+                # Ключи, переданные в самих строках, так восстановить нельзя.
+                sort_ids = (engine.dialect.name == 'sqlite' and table.autoincrement_column is not None
+                            and table.autoincrement_column.name not in columns)
+                stmt = insert(table)
+                if returning:
+                    stmt = stmt.returning(*table.primary_key.columns, sort_by_parameter_order=not sort_ids)
+                if use_copy:
+                    defaults = _copy_defaults(table, columns)
+                    use_copy = defaults is not None
+
+            if use_copy:
+                _copy_batch(connection, table, columns, batch, defaults)
+                # COPY идёт мимо событий движка, которые сбрасывают кэш результатов
+                notify_write(connection, table.fullname)
+            else:
+                result = connection.execute(stmt, _as_dicts(batch, columns))
+                if returning:
+                    batch_ids = result.scalars().all() if len(table.primary_key.columns) == 1 else result.all()
+                    ids.extend(sorted(batch_ids) if sort_ids else batch_ids)
+
+            count += len(batch)
+            batches += 1
+
+    return IngestReport(table.name, count, batches, perf_counter() - started, ids)
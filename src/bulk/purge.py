@@ -0,0 +1,110 @@
+import logging
+from time import perf_counter, sleep
+from typing import Callable
+
+from sqlalchemy import Column, MetaData, Table, delete, insert, select
+from sqlalchemy.engine import Engine
+
+from src.bulk.ingest import IngestReport
+from src.config.engine import get_engine
+
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeReport(IngestReport):
+    """ Ход и итог пакетного удаления: rows - удалено строк, archived - скопировано в архив """
+
+    def __init__(self, table: str, archive: str | None = None):
+        super().__init__(table, 0, 0, 0.0)
+        self.archive = archive
+        self.archived = 0
+
+    def __repr__(self):
+        return (f'<PurgeReport {self.table}: {self.rows} rows deleted, {self.archived} archived '
+                f'in {self.batches} batches, {self.seconds:.3f}s, {self.rows_per_sec:.0f} rows/s>')
+
+
+def archive_table(table: Table, name: str, engine: Engine, schema: str | None = None) -> Table:
+    """ Таблица-архив с теми же столбцами, что у table, без ключей и ограничений; создаётся, если её нет """
+
+    archive = Table(name, MetaData(), *(Column(c.name, c.type) for c in table.columns), schema=schema)
+    archive.create(engine, checkfirst=True)
+    return archive
+
+
+def purge(
+        model,
+        *where,
+        batch_size: int = 5000,
+        archive: str | None = None,
+        archive_schema: str | None = None,
+        throttle: float = 0.0,
+        limit: int | None = None,
+        progress: Callable[[PurgeReport], None] | None = None,
+        key: str = 'postgresql',
+        engine: Engine | None = None,
+) -> PurgeReport:
+    """
+    Удаляет строки model, подходящие под условия where, пачками по batch_size в порядке
+    первичного ключа. Каждая пачка - отдельная короткая транзакция: блокировки держатся
+    только на её строках, а WAL и autovacuum успевают за удалением. Между пачками
+    выполняется пауза throttle секунд.
+
+    Если задан archive, строки пачки в той же транзакции сначала копируются в таблицу
+    archive (создаётся по образцу model). limit ограничивает число строк за один запуск.
+    После каждой пачки отчёт передаётся в progress и пишется в лог.
+
+    Связанные строки (например, manipulation_facts питомца) не удаляются:
+    дочерние таблицы нужно чистить раньше родительских.
+    """
+
+    table = model.__table__
+    engine = engine or get_engine(key)
+    pk_columns = list(table.primary_key.columns)
+    if len(pk_columns) != 1:
+        raise ValueError(f'purge({table.name}): only single-column primary keys are supported')
+    pk = pk_columns[0]
+
+    target = archive_table(table, archive, engine, archive_schema) if archive else None
+    report = PurgeReport(table.name, target.fullname if target is not None else None)
+    last = None
+    started = perf_counter()
+
+    while limit is None or report.rows < limit:
+        size = batch_size if limit is None else min(batch_size, limit - report.rows)
+        criteria = [*where, pk > last] if last is not None else list(where)
+
+        with engine.begin() as connection:
+            # FOR UPDATE: строки пачки не меняются между копированием в архив и удалением
+            ids = connection.execute(
+                select(pk).where(*criteria).order_by(pk).limit(size).with_for_update()
+            ).scalars().all()
+            if not ids:
+                break
+
+            # Условия повторяются в DELETE: на секционированной таблице они отсекают лишние секции
+            batch = [*where, pk.in_(ids)]
+            if target is not None:
+                names = [c.name for c in table.columns]
+                copied = connection.execute(
+                    insert(target).from_select(names, select(*table.columns).where(*batch))
+                )
+                report.archived += copied.rowcount
+            deleted = connection.execute(delete(table).where(*batch))
+
+        last = ids[-1]
+        report.rows += deleted.rowcount
+        report.batches += 1
+        report.seconds = perf_counter() - started
+
+        logger.info('%r', report)
+        if progress is not None:
+            progress(report)
+        if len(ids) < size:
+            break
+        if throttle:
+            sleep(throttle)
+
+    report.seconds = perf_counter() - started
+    return report
@@ -0,0 +1,152 @@
+from itertools import groupby
+from time import perf_counter
+from typing import Iterable, Sequence
+
+from sqlalchemy import bindparam, cast, column, inspect, update, values
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+
+from src.bulk.ingest import IngestReport, batched
+from src.config.engine import get_engine
+
+
+# Предел числа параметров в одном запросе с запасом: у PostgreSQL 65535, у SQLite 32766
+MAX_PARAMS = 32000
+
+_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def _chunk_size(batch_size: int, width: int) -> int:
+    return max(1, min(batch_size, MAX_PARAMS // max(width, 1)))
+
+
+def _by_columns(rows: Iterable[dict], size: int):
+    """ Пачки строк с одинаковым набором ключей; порядок строк внутри набора сохраняется """
+
+    for batch in batched(rows, size):
+        batch.sort(key=lambda row: tuple(sorted(row)))
+        for names, group in groupby(batch, key=lambda row: tuple(sorted(row))):
+            yield names, list(group)
+
+
+def _update_from_values(table, pk: list[str], names: Sequence[str], rows: list[dict]):
+    # UPDATE table SET col = CAST(v.col AS ...) FROM (VALUES ...) AS v (...) WHERE table.pk = v.pk
+    # CAST нужен, т.к. тип столбцов VALUES PostgreSQL выводит по первой строке (NULL -> text)
+    data = values(*(column(name, table.c[name].type) for name in names), name='v')
+    data = data.data([tuple(row[name] for name in names) for row in rows])
+    return (
+        update(table)
+        .where(*(table.c[name] == data.c[name] for name in pk))
+        .values({name: cast(data.c[name], table.c[name].type) for name in names if name not in pk})
+    )
+
+
+def bulk_update(
+        model,
+        rows: Iterable[dict],
+        *,
+        batch_size: int = 1000,
+        key: str = 'postgresql',
+        engine: Engine | None = None,
+) -> IngestReport:
+    """
+    Обновление строк по первичному ключу: каждая строка - словарь {pk: ..., столбец: значение}.
+
+    На PostgreSQL пачка уходит одним UPDATE ... FROM (VALUES ...), на остальных базах -
+    executemany UPDATE ... WHERE pk = ?. Строки с разным набором столбцов обновляются
+    отдельными запросами. В IngestReport.rows - число обновлённых строк.
+    """
+
+    table = model.__table__
+    engine = engine or get_engine(key)
+    pk = [c.name for c in table.primary_key.columns]
+    width = len(table.columns)
+
+    count = batches = 0
+    started = perf_counter()
+
+    with engine.begin() as connection:
+        for names, group in _by_columns(rows, _chunk_size(batch_size, width)):
+            missing = set(pk) - set(names)
+            if missing:
+                raise ValueError(f'bulk_update({table.name}): no primary key {sorted(missing)} in row')
+            if set(names) == set(pk):
+                continue
+
+            if engine.dialect.name == 'postgresql':
+                result = connection.execute(_update_from_values(table, pk, names, group))
+            else:
+                stmt = (
+                    update(table)
+                    .where(*(table.c[name] == bindparam(f'pk_{name}') for name in pk))
+                    .values({name: bindparam(name) for name in names if name not in pk})
+                )
+                params = [{**row, **{f'pk_{name}': row[name] for name in pk}} for row in group]
+                result = connection.execute(stmt, params)
+
+            count += result.rowcount
+            batches += 1
+
+    return IngestReport(table.name, count, batches, perf_counter() - started)
+
+
+def _primary_key(connection, table) -> list[str]:
+    # Первичный ключ в базе может отличаться от модели: у секционированной
+    # manipulation_facts на PostgreSQL он (id, begin_time), и ON CONFLICT (id) не найдёт
+    # подходящего ограничения
+    if connection.dialect.name == 'postgresql':
+        reflected = inspect(connection).get_pk_constraint(table.name, schema=table.schema)['constrained_columns']
+        if reflected:
+            return reflected
+    return [c.name for c in table.primary_key.columns]
+
+
+def bulk_upsert(
+        model,
+        rows: Iterable[dict],
+        *,
+        index_elements: Sequence[str] | None = None,
+        update_columns: Sequence[str] | None = None,
+        batch_size: int = 1000,
+        key: str = 'postgresql',
+        engine: Engine | None = None,
+) -> IngestReport:
+    """
+    Вставка или обновление строк: INSERT ... VALUES (...), (...) ON CONFLICT (...) DO UPDATE,
+    одним запросом на пачку (PostgreSQL и SQLite).
+
+    index_elements - столбцы уникального ограничения, по умолчанию первичный ключ
+    таблицы в базе (для manipulation_facts на PostgreSQL - (id, begin_time));
+    update_columns - столбцы, перезаписываемые при конфликте, по умолчанию все
+    переданные, кроме index_elements. В IngestReport.rows - число вставленных
+    и обновлённых строк.
+    """
+
+    table = model.__table__
+    engine = engine or get_engine(key)
+    insert = _INSERTS.get(engine.dialect.name)
+    if insert is None:
+        raise NotImplementedError(f'bulk_upsert: ON CONFLICT is not supported for {engine.dialect.name}')
+
+    width = len(table.columns)
+
+    count = batches = 0
+    started = perf_counter()
+
+    with engine.begin() as connection:
+        index_elements = list(index_elements or _primary_key(connection, table))
+        for names, group in _by_columns(rows, _chunk_size(batch_size, width)):
+            stmt = insert(table).values(group)
+            targets = update_columns or [name for name in names if name not in index_elements]
+            if targets:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=index_elements,
+                    set_={name: stmt.excluded[name] for name in targets},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+            count += connection.execute(stmt).rowcount
+            batches += 1
+
+    return IngestReport(table.name, count, batches, perf_counter() - started)
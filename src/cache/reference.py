@@ -0,0 +1,79 @@
+from sqlalchemy import event, inspect, select
+
+from src.cache.lru import MISSING, LRUCache
+from src.config.session import session_scope
+from src.models import Manipulations, Species
+
+
+class ReferenceCache:
+    """
+    Read-through кэш маленького справочника: id -> название и название -> id.
+    Записи сбрасываются событиями ORM при вставке, изменении и удалении строк модели.
+    Изменения через Core (insert(Species) и т.п.) событий не вызывают - после них нужен invalidate().
+    """
+
+    def __init__(self, model, name_attr: str, *, ttl: float | None = 600, maxsize: int = 1024,
+                 key: str = 'postgresql'):
+        self.model = model
+        self.name_attr = name_attr
+        self.key = key
+        self._pk = inspect(model).primary_key[0]
+        self._name = getattr(model, name_attr)
+        self._by_id = LRUCache(maxsize, ttl)
+        self._by_name = LRUCache(maxsize, ttl)
+
+        for event_name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, event_name, self._on_change)
+
+    def name(self, pk: int) -> str | None:
+        """ Название по первичному ключу """
+
+        value = self._by_id.get(pk)
+        if value is MISSING:
+            rows = self._load(self._pk == pk)
+            value = rows[0][1] if rows else None
+        return value
+
+    def id(self, name: str) -> int | None:
+        """ Первичный ключ по названию """
+
+        value = self._by_name.get(name)
+        if value is MISSING:
+            rows = self._load(self._name == name)
+            value = rows[0][0] if rows else None
+        return value
+
+    def preload(self) -> None:
+        """ Загружает справочник целиком одним запросом """
+
+        self._load()
+
+    def _load(self, *criteria) -> list:
+        with session_scope(self.key) as session:
+            rows = session.execute(select(self._pk, self._name).where(*criteria)).all()
+        for pk, name in rows:
+            self._by_id.set(pk, name)
+            self._by_name.set(name, pk)
+        return rows
+
+    def invalidate(self, pk: int | None = None) -> None:
+        """ Сбрасывает одну запись или, без аргумента, весь кэш """
+
+        if pk is None:
+            self._by_id.clear()
+            self._by_name.clear()
+            return
+        self._by_id.pop(pk)
+        for name, cached_pk in self._by_name.items():
+            if cached_pk == pk:
+                self._by_name.pop(name)
+
+    def _on_change(self, mapper, connection, target) -> None:
+        self.invalidate(mapper.primary_key_from_instance(target)[0])
+
+    def stats(self) -> dict:
+        return {'by_id': self._by_id.stats(), 'by_name': self._by_name.stats()}
+
+
+species_cache = ReferenceCache(Species, 'species_name')
+manipulations_cache = ReferenceCache(Manipulations, 'manipulation_name')
@@ -0,0 +1,161 @@
+import re
+from threading import Lock
+from typing import Any
+
+from sqlalchemy import Select, event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+from src.cache.lru import MISSING, LRUCache
+
+
+# Таблица, которую меняет текстовый запрос (text(), exec_driver_sql)
+_TEXT_DML = re.compile(
+    r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|COPY)\s+(?:ONLY\s+)?"?([\w.]+)"?',
+    re.IGNORECASE,
+)
+
+
+# Кэши, подключённые к движку: им notify_write() сообщает о записи в обход событий SQLAlchemy
+_attached: dict[Engine, list['ResultCache']] = {}
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class ResultCache:
+    """
+    Кэш результатов SELECT: ключ - SQL запроса и значения параметров, значение - список строк.
+
+    У каждой таблицы есть номер версии; запись помнит версии прочитанных таблиц и
+    считается устаревшей, если какая-то из них изменилась. Версия увеличивается при
+    INSERT / UPDATE / DELETE через подключённый движок (ORM flush, Core, text()) и
+    повторно при commit этой транзакции. Запись через DBAPI-курсор в обход событий
+    SQLAlchemy (COPY в bulk_insert) сообщает о себе через notify_write(); изменения
+    из других процессов и сервисов нужно сбрасывать invalidate().
+
+    Пока в транзакции есть несохранённые изменения таблицы, запросы к ней
+    в этой транзакции выполняются без кэша.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = 60):
+        self._entries = LRUCache(maxsize, ttl)
+        self._sql = LRUCache(maxsize)
+        self._versions: dict[str, int] = {}
+        self._engines: set[Engine] = set()
+        self._lock = Lock()
+        self.invalidations = 0
+
+    def attach(self, engine: Engine) -> 'ResultCache':
+        """ Подключает сброс записей к событиям движка (повторный вызов ничего не делает) """
+
+        engine = engine.engine
+        with self._lock:
+            if engine in self._engines:
+                return self
+            self._engines.add(engine)
+            _attached.setdefault(engine, []).append(self)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'commit', self._on_commit)
+        event.listen(engine, 'rollback', self._on_rollback)
+        return self
+
+    def fetch(self, executor: Session | Connection, stmt: Select, params: dict | None = None) -> list:
+        """
+        Строки результата stmt из кэша или из базы. Для select(Model) возвращаются
+        строки со столбцами модели, а не объекты ORM.
+        """
+
+        connection = executor.connection() if isinstance(executor, Session) else executor
+        self.attach(connection.engine)
+
+        cache_key = stmt._generate_cache_key()
+        sql, tables = self._compiled(connection, stmt, cache_key)
+        values = {bind.key: bind.effective_value for bind in cache_key.bindparams}
+        values.update(params or {})
+        key = (sql, _freeze(values))
+
+        if tables & connection.info.get(self, set()):
+            return connection.execute(stmt, params).all()
+
+        entry = self._entries.get(key)
+        if entry is not MISSING:
+            versions, rows = entry
+            if all(self._versions.get(table, 0) == version for table, version in versions):
+                return list(rows)
+            self._entries.pop(key)
+
+        # Версии берутся до запроса: изменение во время его выполнения сделает запись устаревшей
+        versions = tuple((table, self._versions.get(table, 0)) for table in tables)
+        rows = connection.execute(stmt, params).all()
+        self._entries.set(key, (versions, rows))
+        return list(rows)
+
+    def _compiled(self, connection: Connection, stmt: Select, cache_key) -> tuple[str, frozenset]:
+        # SQL и прочитанные таблицы зависят только от структуры запроса, а не от значений параметров
+        compiled = self._sql.get((connection.dialect.name, cache_key.key))
+        if compiled is MISSING:
+            sql = str(stmt.compile(dialect=connection.dialect))
+            tables = frozenset(table.fullname for table in find_tables(stmt, check_columns=True)
+                               if hasattr(table, 'fullname'))
+            compiled = (sql, tables)
+            self._sql.set((connection.dialect.name, cache_key.key), compiled)
+        return compiled
+
+    def invalidate(self, *tables: str) -> None:
+        """ Делает устаревшими записи, читающие tables; без аргументов - весь кэш """
+
+        if not tables:
+            self._entries.clear()
+            return
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            self.invalidations += 1
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context.isinsert or context.isupdate or context.isdelete:
+            table = getattr(context.compiled.statement.table, 'fullname', None)
+        elif context.is_text:
+            match = _TEXT_DML.match(statement)
+            table = match.group(1) if match else None
+        else:
+            return
+        if table is not None:
+            self._record_write(conn, table)
+
+    def _record_write(self, conn: Connection, table: str) -> None:
+        conn.info.setdefault(self, set()).add(table)
+        self.invalidate(table)
+
+    def _on_commit(self, conn) -> None:
+        # Повторно: другое соединение могло закэшировать строки до коммита изменений
+        tables = conn.info.pop(self, None)
+        if tables:
+            self.invalidate(*tables)
+
+    def _on_rollback(self, conn) -> None:
+        conn.info.pop(self, None)
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), 'invalidations': self.invalidations}
+
+
+def notify_write(connection: Connection, table: str) -> None:
+    """
+    Сбрасывает записи кэшей движка connection, читающие table, после записи мимо
+    событий SQLAlchemy (COPY через DBAPI-курсор). Как и обычная запись, повторяется
+    при commit, а до него запросы этой транзакции к table идут без кэша.
+    """
+
+    for cache in _attached.get(connection.engine, ()):
+        cache._record_write(connection, table)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,238 @@
+import sys
+from itertools import chain
+from typing import Any, Hashable, Iterator
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, make_transient_to_detached, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.cache.lru import MISSING, LRUCache
+from src.config.engine import get_engine
+from src.models import Owners, Pets
+
+
+class DictBackend:
+    """
+    Простейшее хранилище для SecondLevelCache на обычном dict: без вытеснения и TTL.
+    Образец интерфейса для внешних хранилищ и замена LRUCache в тестах.
+    """
+
+    def __init__(self):
+        self.data: dict[Hashable, Any] = {}
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        return self.data.get(key, default)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.data[key] = value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self.data.pop(key, default)
+
+    def clear(self) -> None:
+        self.data.clear()
+
+    def items(self) -> Iterator[tuple[Hashable, Any]]:
+        return iter(list(self.data.items()))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class SecondLevelCache:
+    """
+    Кэш строк моделей между сессиями: (имя модели, первичный ключ) -> значения столбцов.
+
+    Заполняется объектами, которые загрузила любым запросом CachingSession этого кэша,
+    читается через CachingSession.get(). Записи сбрасываются после flush любой сессии,
+    изменившей, добавившей или удалившей объект, повторно после её commit или rollback,
+    а также целиком для модели при ORM-запросах insert/update/delete(Model) через сессию.
+    Пока транзакция открыта, строки, которые она изменила, в кэш не кладутся: их значения
+    ещё не зафиксированы. Изменения через Core (engine.begin(), src/bulk) событий
+    не вызывают - после них нужен invalidate().
+    """
+
+    def __init__(self, *models, backend=None, maxsize: int = 10000, ttl: float | None = 300):
+        self.backend = backend if backend is not None else LRUCache(maxsize, ttl)
+        self.mappers = {inspect(model) for model in models}
+        self.hits = 0
+        self.misses = 0
+        self._info_key = ('second_level_cache', id(self))
+
+        for model in models:
+            event.listen(model, 'load', self._on_load)
+            event.listen(model, 'refresh', self._on_refresh)
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        event.listen(Session, 'do_orm_execute', self._on_orm_execute)
+
+    @staticmethod
+    def cache_key(mapper, ident: tuple) -> tuple:
+        return (mapper.class_.__name__, *ident)
+
+    def lookup(self, session: Session, model, ident: tuple):
+        """ Объект из кэша, добавленный в session без запроса к базе; None - промах """
+
+        mapper = inspect(model)
+        values = self.backend.get(self.cache_key(mapper, ident), MISSING)
+        if values is MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        obj = mapper.class_manager.new_instance()
+        for name, value in values.items():
+            set_committed_value(obj, name, value)
+        make_transient_to_detached(obj)
+        session.add(obj)
+        return obj
+
+    def store(self, obj, session: Session | None = None) -> None:
+        """
+        Кладёт в кэш значения столбцов объекта, если все они загружены и
+        незафиксированная транзакция session не меняла эту строку или модель
+        """
+
+        state = inspect(obj)
+        if state.key is None:
+            return
+        names = [prop.key for prop in state.mapper.column_attrs]
+        if any(name not in state.dict for name in names):
+            return
+        cache_key = self.cache_key(state.mapper, state.key[1])
+        if session is not None:
+            changed = session.info.get(self._info_key, ())
+            if cache_key in changed or cache_key[:1] in changed:
+                return
+        self.backend.set(cache_key, {name: state.dict[name] for name in names})
+
+    def invalidate(self, model=None, ident: tuple | None = None) -> None:
+        """ Сбрасывает запись, все записи модели или, без аргументов, весь кэш """
+
+        if model is None:
+            self.backend.clear()
+        elif ident is not None:
+            self.backend.pop(self.cache_key(inspect(model), ident))
+        else:
+            self._drop((inspect(model).class_.__name__,))
+
+    def _drop(self, cache_key: tuple) -> None:
+        # (имя модели,) - все записи модели
+        if len(cache_key) > 1:
+            self.backend.pop(cache_key)
+            return
+        for key, _ in self.backend.items():
+            if key[0] == cache_key[0]:
+                self.backend.pop(key)
+
+    def _owns(self, session) -> bool:
+        return getattr(session, 'second_level_cache', None) is self
+
+    def _on_load(self, target, context) -> None:
+        if self._owns(context.session):
+            self.store(target, context.session)
+
+    def _on_refresh(self, target, context, attrs) -> None:
+        if attrs is None and self._owns(context.session):
+            self.store(target, context.session)
+
+    def _after_flush(self, session, flush_context) -> None:
+        # В after_flush new, dirty и deleted ещё содержат объекты до flush;
+        # у новых объектов первичный ключ уже получен, но key ещё не назначен
+        keys = session.info.setdefault(self._info_key, set())
+        for obj in chain(session.new, session.dirty, session.deleted):
+            state = inspect(obj)
+            if state.mapper in self.mappers:
+                ident = state.mapper.identity_key_from_instance(obj)[1]
+                cache_key = self.cache_key(state.mapper, ident)
+                keys.add(cache_key)
+                self.backend.pop(cache_key)
+
+    def _after_commit(self, session) -> None:
+        # Повторный сброс: другая сессия могла положить в кэш строку до коммита изменений
+        for cache_key in session.info.pop(self._info_key, ()):
+            self._drop(cache_key)
+
+    def _after_rollback(self, session) -> None:
+        # Сбрасываем всё, что транзакция меняла: запись могла попасть в кэш
+        # из другой сессии между flush и rollback
+        for cache_key in session.info.pop(self._info_key, ()):
+            self._drop(cache_key)
+
+    def _on_orm_execute(self, orm_execute_state) -> None:
+        if orm_execute_state.is_select:
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper in self.mappers:
+            name = mapper.class_.__name__
+            orm_execute_state.session.info.setdefault(self._info_key, set()).add((name,))
+            self._drop((name,))
+
+    def memory(self) -> int:
+        """ Приблизительный объём кэша в байтах: ключи, словари значений и сами значения """
+
+        total = 0
+        for cache_key, values in self.backend.items():
+            total += sys.getsizeof(cache_key) + sys.getsizeof(values)
+            total += sum(sys.getsizeof(value) for value in values.values())
+        return total
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+            'memory_bytes': self.memory(),
+        }
+
+
+class CachingSession(Session):
+    """
+    Сессия с кэшем второго уровня: get() по первичному ключу сначала смотрит
+    identity map, затем second_level_cache и только потом идёт в базу.
+    """
+
+    def __init__(self, *args, second_level_cache: SecondLevelCache, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.second_level_cache = second_level_cache
+
+    def get(self, entity, ident, **kwargs):
+        cache = self.second_level_cache
+        mapper = inspect(entity)
+        if kwargs or mapper not in cache.mappers or isinstance(ident, dict):
+            return super().get(entity, ident, **kwargs)
+
+        ident = tuple(ident) if isinstance(ident, (tuple, list)) else (ident,)
+        if mapper.identity_key_from_primary_key(ident) in self.identity_map:
+            return super().get(entity, ident)
+        obj = cache.lookup(self, entity, ident)
+        if obj is None:
+            # Промах: объект попадёт в кэш из события load
+            obj = super().get(entity, ident)
+        return obj
+
+
+entity_cache = SecondLevelCache(Pets, Owners)
+
+_sessionmakers: dict[Engine, sessionmaker] = {}
+
+
+def get_caching_sessionmaker(key: str = 'postgresql') -> sessionmaker:
+    """ Фабрика CachingSession с общим кэшем entity_cache для Pets и Owners """
+
+    engine = get_engine(key)
+    factory = _sessionmakers.get(engine)
+    if factory is None:
+        factory = _sessionmakers.setdefault(
+            engine, sessionmaker(bind=engine, class_=CachingSession, expire_on_commit=False,
+                                 second_level_cache=entity_cache)
+        )
+    return factory
@@ -0,0 +1,59 @@
+from threading import Lock
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.config.engine import engine_kwargs
+from src.config.url import DB_URL
+
+
+# Асинхронные драйверы для бэкендов из DB_URL
+ASYNC_DRIVERS = {
+    'postgresql': 'asyncpg',
+    'sqlite': 'aiosqlite',
+}
+
+_engines: dict[str, AsyncEngine] = {}
+_lock = Lock()
+
+
+def async_url(url: str) -> str:
+    """ Тот же URL, но с асинхронным драйвером: postgresql+psycopg2 -> postgresql+asyncpg """
+
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'Нет асинхронного драйвера для {backend!r}')
+    return url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}').render_as_string(hide_password=False)
+
+
+def build_async_engine(url: str, **options) -> AsyncEngine:
+    """ Асинхронный движок с теми же настройками пула, что и у build_engine() """
+
+    url = async_url(url)
+    return create_async_engine(url, **engine_kwargs(url, **options))
+
+
+def get_async_engine(key: str = 'postgresql', **options) -> AsyncEngine:
+    """
+    Возвращает общий для процесса асинхронный движок для ключа из DB_URL.
+    options учитываются только при первом создании движка.
+    """
+
+    engine = _engines.get(key)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = _engines[key] = build_async_engine(DB_URL[key], **options)
+    return engine
+
+
+async def dispose_async_engines() -> None:
+    """ Закрывает все соединения и забывает созданные асинхронные движки """
+
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        await engine.dispose()
@@ -0,0 +1,37 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from src.config.async_engine import get_async_engine
+
+
+_sessionmakers: dict[AsyncEngine, async_sessionmaker] = {}
+
+
+def get_async_sessionmaker(key: str = 'postgresql') -> async_sessionmaker:
+    """ Фабрика асинхронных сессий, привязанная к общему движку для ключа из DB_URL """
+
+    engine = get_async_engine(key)
+    factory = _sessionmakers.get(engine)
+    if factory is None:
+        factory = _sessionmakers.setdefault(
+            engine, async_sessionmaker(bind=engine, expire_on_commit=False)
+        )
+    return factory
+
+
+@asynccontextmanager
+async def async_session_scope(key: str = 'postgresql') -> AsyncIterator[AsyncSession]:
+    """
+    Асинхронная сессия в рамках одной транзакции:
+    commit при успешном выходе, rollback при исключении
+    """
+
+    async with get_async_sessionmaker(key)() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
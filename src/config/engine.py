@@ -0,0 +1,101 @@
+from threading import Lock
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
+
+from src.config.url import DB_REPLICAS, DB_URL
+
+
+# Настройки пула по умолчанию. echo выключен: логирование каждого запроса в stdout
+# на горячих путях стоит дороже самого запроса.
+ENGINE_OPTIONS = {
+    'echo': False,
+    'pool_size': 10,            # постоянные соединения в QueuePool
+    'max_overflow': 20,         # дополнительные соединения сверх pool_size под пиковую нагрузку
+    'pool_timeout': 30,         # сколько секунд ждать свободное соединение
+    'pool_pre_ping': True,      # проверка соединения перед выдачей из пула
+    'pool_recycle': 1800,       # пересоздание соединений старше N секунд
+    'statement_timeout': 30000, # ограничение времени выполнения запроса, мс (только PostgreSQL)
+}
+
+_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle')
+
+_engines: dict[str, Engine] = {}
+_lock = Lock()
+
+
+def engine_kwargs(url: str, **options) -> dict:
+    """
+    Аргументы create_engine() / create_async_engine() для url.
+    Параметры из options переопределяют ENGINE_OPTIONS.
+    """
+
+    options = {**ENGINE_OPTIONS, **options}
+    statement_timeout = options.pop('statement_timeout')
+    connect_args = dict(options.pop('connect_args', {}))
+    url = make_url(url)
+
+    if url.get_backend_name() == 'sqlite':
+        # SQLite работает с файлом в том же процессе, сетевого пула и таймаута запросов у него нет
+        for name in _POOL_OPTIONS:
+            options.pop(name)
+        if url.database in (None, '', ':memory:'):
+            # Одно соединение на весь процесс, иначе каждое соединение увидит свою пустую БД
+            options['poolclass'] = StaticPool
+            connect_args.setdefault('check_same_thread', False)
+    elif url.get_backend_name() == 'postgresql' and statement_timeout:
+        if url.get_driver_name() == 'asyncpg':
+            server_settings = connect_args.setdefault('server_settings', {})
+            server_settings.setdefault('statement_timeout', str(int(statement_timeout)))
+        else:
+            connect_args.setdefault('options', f'-c statement_timeout={int(statement_timeout)}')
+
+    if url.get_backend_name() == 'postgresql' and url.get_driver_name() == 'psycopg2':
+        # executemany для UPDATE/DELETE через execute_batch: пачка строк за одно обращение к серверу
+        options.setdefault('executemany_mode', 'values_plus_batch')
+
+    return {'connect_args': connect_args, **options}
+
+
+def build_engine(url: str, **options) -> Engine:
+    """ Создаёт движок с настроенным пулом соединений """
+
+    return create_engine(url, **engine_kwargs(url, **options))
+
+
+def _shared_engine(name: str, url: str, options: dict) -> Engine:
+    engine = _engines.get(name)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine = _engines[name] = build_engine(url, **options)
+    return engine
+
+
+def get_engine(key: str = 'postgresql', **options) -> Engine:
+    """
+    Возвращает общий для процесса движок для ключа из DB_URL.
+    options учитываются только при первом создании движка.
+    """
+
+    return _shared_engine(key, DB_URL[key], options)
+
+
+def get_replica_engines(key: str = 'postgresql', **options) -> list[Engine]:
+    """ Общие для процесса движки реплик из DB_REPLICAS[key]; без реплик - пустой список """
+
+    return [
+        _shared_engine(f'{key}/replica{index}', url, options)
+        for index, url in enumerate(DB_REPLICAS.get(key, ()))
+    ]
+
+
+def dispose_engines() -> None:
+    """ Закрывает все соединения и забывает созданные движки """
+
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
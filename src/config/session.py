@@ -0,0 +1,257 @@
+import random
+import re
+from contextlib import contextmanager
+from time import monotonic
+from typing import Iterable, Iterator, Sequence
+
+from sqlalchemy import Delete, Insert, Select, TextClause, Update, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.config.engine import get_engine, get_replica_engines
+
+
+_sessionmakers: dict[Engine, sessionmaker] = {}
+_routing_sessionmakers: dict[Engine, sessionmaker] = {}
+
+_READ_ONLY_TEXT = re.compile(r'^\s*(SELECT|SHOW|EXPLAIN)\b(?!.*\bFOR\s+(UPDATE|SHARE)\b)', re.IGNORECASE | re.DOTALL)
+
+
+class BatchingSession(Session):
+    """
+    Сессия для массовой записи. Сам flush здесь обычный: ORM и в простой Session группирует
+    INSERT одной таблицы в insertmanyvalues с RETURNING, а UPDATE - в executemany.
+    BatchingSession добавляет только момент сброса: autoflush перед каждым запросом
+    выключен, изменения сбрасываются, когда накопилось max_batch новых или изменённых
+    объектов, или когда с первого несброшенного изменения прошло flush_interval секунд.
+    Проверка выполняется при add() и при изменении атрибутов загруженных объектов,
+    так что ограничения действуют и для заданий, которые в основном обновляют строки.
+
+    На SQLite у autoincrement ключа нет sentinel-столбца, поэтому INSERT с RETURNING
+    там остаются построчными в любой сессии.
+    """
+
+    def __init__(self, *args, max_batch: int = 1000, flush_interval: float | None = 1.0, **kwargs):
+        kwargs.setdefault('autoflush', False)
+        super().__init__(*args, **kwargs)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._pending_since: float | None = None
+        self._changed: set = set()
+
+    def _track(self) -> None:
+        self._pending += 1
+        if self._pending_since is None:
+            self._pending_since = monotonic()
+
+    def add(self, instance: object, _warn: bool = True) -> None:
+        _watch_mapper(inspect(instance).mapper)
+        super().add(instance, _warn)
+        self._track()
+        self.flush_if_due()
+
+    def add_all(self, instances: Iterable[object]) -> None:
+        for instance in instances:
+            self.add(instance)
+
+    def _on_change(self, state, related=None) -> None:
+        # Изменённый объект считается один раз до следующего flush. Новые объекты считает
+        # add(), а добавленные каскадом через relationship (owner.pets.append(pet)) - здесь
+        if self._flushing:
+            return
+        changed = [item for item in (state, related)
+                   if item is not None and item not in self._changed and (item is related or state.key is not None)]
+        if not changed:
+            return
+        # Событие приходит до записи нового значения: сначала сбрасывается уже накопленная пачка
+        self.flush_if_due()
+        for item in changed:
+            self._changed.add(item)
+            self._track()
+
+    def flush_if_due(self) -> None:
+        """ Сбрасывает изменения, если пачка заполнена или истёк flush_interval """
+
+        if self._pending_since is None:
+            return
+        if self._pending >= self.max_batch or (
+                self.flush_interval is not None and monotonic() - self._pending_since >= self.flush_interval):
+            self.flush()
+
+    def flush(self, objects=None) -> None:
+        super().flush(objects)
+        if objects is None:
+            self._pending = 0
+            self._pending_since = None
+            self._changed.clear()
+
+
+_watched_mappers = set()
+
+
+def _on_attribute_change(state, value, *args) -> None:
+    session = state.session
+    if isinstance(session, BatchingSession):
+        related = inspect(value, raiseerr=False)
+        if related is not None and related.key is None:
+            _watch_mapper(related.mapper)
+        else:
+            related = None
+        session._on_change(state, related)
+
+
+def _watch_mapper(mapper) -> None:
+    # События изменения атрибутов вешаются на класс модели один раз,
+    # когда её объекты впервые попадают в BatchingSession
+    if mapper in _watched_mappers:
+        return
+    _watched_mappers.add(mapper)
+    for prop in mapper.attrs:
+        attribute = prop.class_attribute
+        if getattr(prop, 'uselist', False):
+            event.listen(attribute, 'append', _on_attribute_change, raw=True)
+            event.listen(attribute, 'remove', _on_attribute_change, raw=True)
+        else:
+            event.listen(attribute, 'set', _on_attribute_change, raw=True)
+
+
+@event.listens_for(BatchingSession, 'loaded_as_persistent')
+def _watch_loaded(session, instance) -> None:
+    _watch_mapper(inspect(instance).mapper)
+
+
+class ReplicaRouter:
+    """
+    Выбор сервера для чтения: основной или одна из реплик.
+
+    После коммита с записью чтение sticky_seconds секунд идёт на основной сервер,
+    пока реплики догоняют его ("read-your-writes"). Окно общее для процесса.
+    """
+
+    def __init__(self, primary: Engine, replicas: Sequence[Engine] = (), sticky_seconds: float = 5.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self._written_at: float | None = None
+
+    def mark_written(self) -> None:
+        self._written_at = monotonic()
+
+    def recently_written(self) -> bool:
+        return self._written_at is not None and monotonic() - self._written_at < self.sticky_seconds
+
+    def replica(self) -> Engine:
+        """ Случайная реплика; без реплик - основной сервер """
+
+        return random.choice(self.replicas) if self.replicas else self.primary
+
+
+class RoutingSession(Session):
+    """
+    Сессия, распределяющая запросы между основным сервером и репликами: flush, INSERT/UPDATE/DELETE
+    и SELECT ... FOR UPDATE идут на основной сервер, остальные запросы - на реплику, выбранную
+    один раз на сессию. text() и session.connection() без запроса тоже идут на основной сервер:
+    по ним не понять, пишут ли они. После первой записи и при write=True сессия до конца
+    работает только с основным сервером.
+    """
+
+    def __init__(self, *args, router: ReplicaRouter, write: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self._use_primary = write
+        self._wrote = False
+        self._replica: Engine | None = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)) or (
+                isinstance(clause, Select) and clause._for_update_arg is not None):
+            self._use_primary = self._wrote = True
+        elif clause is None or isinstance(clause, TextClause):
+            # Текстовый SELECT только читает; остальное считается записью
+            self._use_primary = True
+            if not (isinstance(clause, TextClause) and _READ_ONLY_TEXT.match(clause.text)):
+                self._wrote = True
+        if self._use_primary or self.router.recently_written():
+            return self.router.primary
+        if self._replica is None:
+            self._replica = self.router.replica()
+        return self._replica
+
+    def commit(self) -> None:
+        super().commit()
+        if self._wrote:
+            self.router.mark_written()
+            self._wrote = False
+
+
+def get_sessionmaker(key: str = 'postgresql') -> sessionmaker:
+    """ Фабрика сессий, привязанная к общему движку для ключа из DB_URL """
+
+    engine = get_engine(key)
+    factory = _sessionmakers.get(engine)
+    if factory is None:
+        factory = _sessionmakers.setdefault(
+            engine, sessionmaker(bind=engine, expire_on_commit=False)
+        )
+    return factory
+
+
+def get_batching_sessionmaker(key: str = 'postgresql', max_batch: int = 1000,
+                              flush_interval: float | None = 1.0) -> sessionmaker:
+    """ Фабрика BatchingSession; размер пачки insertmanyvalues совпадает с max_batch """
+
+    engine = get_engine(key).execution_options(insertmanyvalues_page_size=max_batch)
+    return sessionmaker(bind=engine, class_=BatchingSession, expire_on_commit=False,
+                        max_batch=max_batch, flush_interval=flush_interval)
+
+
+def get_routing_sessionmaker(key: str = 'postgresql', sticky_seconds: float = 5.0) -> sessionmaker:
+    """
+    Фабрика RoutingSession для основного сервера DB_URL[key] и реплик DB_REPLICAS[key].
+    sticky_seconds учитывается только при первом вызове для key.
+    """
+
+    primary = get_engine(key)
+    factory = _routing_sessionmakers.get(primary)
+    if factory is None:
+        router = ReplicaRouter(primary, get_replica_engines(key), sticky_seconds)
+        factory = _routing_sessionmakers.setdefault(
+            primary, sessionmaker(class_=RoutingSession, router=router, expire_on_commit=False)
+        )
+    return factory
+
+
+@contextmanager
+def _transaction(factory: sessionmaker, **kwargs) -> Iterator[Session]:
+    with factory(**kwargs) as session:
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+
+def session_scope(key: str = 'postgresql'):
+    """
+    Сессия в рамках одной транзакции:
+    commit при успешном выходе, rollback при исключении
+    """
+
+    return _transaction(get_sessionmaker(key))
+
+
+def batching_session_scope(key: str = 'postgresql', max_batch: int = 1000, flush_interval: float | None = 1.0):
+    """ То же, что session_scope(), но с BatchingSession для массовой записи """
+
+    return _transaction(get_batching_sessionmaker(key, max_batch, flush_interval))
+
+
+def routing_session_scope(key: str = 'postgresql', write: bool = False):
+    """
+    То же, что session_scope(), но чтение уходит на реплики.
+    write=True - явная пишущая транзакция: все запросы на основной сервер.
+    """
+
+    return _transaction(get_routing_sessionmaker(key), write=write)
@@ -0,0 +1,282 @@
+"""
+Операции Alembic для больших таблиц без долгих блокировок.
+
+    from src.maintenance.online_migrations import add_column, create_index
+
+    def upgrade() -> None:
+        add_column('pets', sa.Column('weight_g', sa.Integer),
+                   backfill_values={'weight_g': 'round(weight * 1000)'}, not_null=False)
+        create_index('ix_pets_weight_g', 'pets', ['weight_g'])
+
+DDL выполняется с коротким lock_timeout и повторяется при неудаче: ALTER TABLE,
+вставший в очередь за долгой транзакцией, иначе блокирует все запросы к таблице.
+Заполнение столбцов идёт пачками по первичному ключу, каждая пачка - отдельная
+транзакция. Вне PostgreSQL операции выполняются обычными op.*.
+"""
+
+import logging
+import random
+from contextlib import nullcontext
+from time import perf_counter, sleep
+from typing import Callable
+
+import sqlalchemy as sa
+from alembic import op
+
+from src.bulk.ingest import IngestReport
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = '3s'
+STATEMENT_TIMEOUT = '60s'
+# SQLSTATE lock_not_available: не дождались блокировки за lock_timeout
+LOCK_NOT_AVAILABLE = '55P03'
+# SQLSTATE deadlock_detected
+DEADLOCK_DETECTED = '40P01'
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _offline() -> bool:
+    return op.get_context().as_sql
+
+
+def _autocommit(connection) -> bool:
+    return connection.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+
+
+def _pgcode(exc: Exception) -> str | None:
+    return getattr(getattr(exc, 'orig', None), 'pgcode', None)
+
+
+def _lock_not_available(exc: Exception) -> bool:
+    return _pgcode(exc) == LOCK_NOT_AVAILABLE
+
+
+def with_lock_retries(fn: Callable[[], object], *, lock_timeout: str = LOCK_TIMEOUT, attempts: int = 5,
+                      delay: float = 1.0):
+    """
+    Выполняет fn() (операции op.*) с lock_timeout и повторяет её, если блокировку
+    не удалось получить. Паузы между попытками растут вдвое со случайным разбросом.
+    Внутри транзакции каждая попытка выполняется в SAVEPOINT.
+    """
+
+    if not _is_postgresql():
+        return fn()
+    if _offline():
+        op.execute(f"SET lock_timeout = '{lock_timeout}'")
+        return fn()
+
+    connection = op.get_bind()
+    autocommit = _autocommit(connection)
+    previous = connection.exec_driver_sql('SHOW lock_timeout').scalar()
+    set_timeout = sa.text('SELECT set_config(\'lock_timeout\', :value, :is_local)')
+
+    try:
+        for attempt in range(1, attempts + 1):
+            try:
+                if autocommit:
+                    connection.execute(set_timeout, {'value': lock_timeout, 'is_local': False})
+                    return fn()
+                with connection.begin_nested():
+                    connection.execute(set_timeout, {'value': lock_timeout, 'is_local': True})
+                    return fn()
+            except sa.exc.OperationalError as exc:
+                if not _lock_not_available(exc) or attempt == attempts:
+                    raise
+                pause = delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                logger.warning('lock_timeout %s exceeded, attempt %d of %d, retrying in %.1fs',
+                               lock_timeout, attempt, attempts, pause)
+                sleep(pause)
+    finally:
+        connection.execute(set_timeout, {'value': previous, 'is_local': not autocommit})
+
+
+def _partitions(table: str) -> list[str] | None:
+    # Секции секционированной таблицы PostgreSQL; None - таблица обычная
+    connection = op.get_bind()
+    kind = connection.execute(
+        sa.text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)'), {'table': table}
+    ).scalar()
+    if kind != 'p':
+        return None
+    return list(connection.execute(
+        sa.text('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(:table) '
+                'ORDER BY 1'),
+        {'table': table},
+    ).scalars())
+
+
+def _invalid_index(name: str) -> bool:
+    return bool(op.get_bind().execute(
+        sa.text('SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'), {'name': name}
+    ).scalar())
+
+
+def _create_index_concurrently(name: str, table: str, columns: list[str], attempts: int, *,
+                               lock_timeout: str = LOCK_TIMEOUT, delay: float = 1.0, **kw) -> None:
+    # Каждая попытка - один CREATE INDEX CONCURRENTLY: прерванная сборка оставляет
+    # невалидный индекс, и повтор той же команды упал бы с 42P07 "already exists".
+    # Поэтому невалидный индекс удаляется перед каждой попыткой (в том числе оставшийся
+    # от прошлого запуска миграции); валидный индекс с тем же именем не трогаем.
+    connection = op.get_bind()
+    set_timeout = sa.text("SELECT set_config('lock_timeout', :value, false)")
+    previous = connection.exec_driver_sql('SHOW lock_timeout').scalar()
+    try:
+        for attempt in range(1, attempts + 1):
+            if _invalid_index(name):
+                with_lock_retries(lambda: op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            connection.execute(set_timeout, {'value': lock_timeout})
+            try:
+                op.create_index(name, table, columns, postgresql_concurrently=True, **kw)
+                return
+            except sa.exc.DBAPIError as exc:
+                # Повторяем только то, что может пройти со второй попытки
+                if _pgcode(exc) not in (LOCK_NOT_AVAILABLE, DEADLOCK_DETECTED) or attempt == attempts:
+                    if _invalid_index(name):
+                        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+                    raise
+                pause = delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                logger.warning('CREATE INDEX CONCURRENTLY %s failed, attempt %d of %d, retrying in %.1fs',
+                               name, attempt, attempts, pause)
+                sleep(pause)
+    finally:
+        connection.execute(set_timeout, {'value': previous})
+
+
+def create_index(name: str, table: str, columns: list[str], *, attempts: int = 3, **kw) -> None:
+    """
+    CREATE INDEX CONCURRENTLY вне транзакции миграции: запись в таблицу не блокируется.
+
+    У секционированной таблицы индекс создаётся на родителе (ON ONLY, без построения),
+    строится CONCURRENTLY на каждой секции и присоединяется к родительскому.
+    """
+
+    if not _is_postgresql():
+        op.create_index(name, table, columns, **kw)
+        return
+    if _offline():
+        # Без подключения секции не узнать: выводится индекс для обычной таблицы
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True, **kw)
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute("SET statement_timeout = 0")
+        partitions = _partitions(table)
+        if partitions is None:
+            _create_index_concurrently(name, table, columns, attempts, **kw)
+        else:
+            unique = 'UNIQUE ' if kw.get('unique') else ''
+            with_lock_retries(lambda: op.execute(
+                f'CREATE {unique}INDEX IF NOT EXISTS {name} ON ONLY {table} ({", ".join(columns)})'
+            ))
+            for partition in partitions:
+                child = f'{name}_{partition.removeprefix(table).lstrip("_")}'[:63]
+                _create_index_concurrently(child, partition, columns, attempts, **kw)
+                with_lock_retries(lambda: op.execute(f'ALTER INDEX {name} ATTACH PARTITION {child}'))
+        op.execute('RESET statement_timeout')
+
+
+def drop_index(name: str, table: str | None = None) -> None:
+    """ DROP INDEX CONCURRENTLY вне транзакции миграции """
+
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        with_lock_retries(lambda: op.drop_index(name, table_name=table, postgresql_concurrently=True,
+                                                if_exists=True))
+
+
+def backfill(table: str, values: dict[str, str], *, where: str | None = None, key: str = 'id',
+             batch_size: int = 10000, throttle: float = 0.0, statement_timeout: str = STATEMENT_TIMEOUT,
+             progress: Callable[[IngestReport], None] | None = None) -> IngestReport:
+    """
+    UPDATE table SET столбец = выражение (values - SQL-выражения) пачками по batch_size строк
+    в порядке key. На PostgreSQL каждая пачка - отдельная транзакция с таймаутами и повтором
+    при lock_timeout, между пачками - пауза throttle секунд. Ход выполнения пишется в лог
+    и передаётся в progress. В offline-режиме (--sql) выводится один UPDATE на всю таблицу.
+    """
+
+    assignments = ', '.join(f'{column} = {expression}' for column, expression in values.items())
+    condition = f' AND ({where})' if where else ''
+    report = IngestReport(table, 0, 0, 0.0)
+
+    if _offline():
+        op.execute(f'UPDATE {table} SET {assignments} WHERE TRUE{condition}')
+        return report
+
+    def batch_sql(after: bool) -> sa.TextClause:
+        bound = f'{key} > :last' if after else 'TRUE'
+        return sa.text(
+            f'UPDATE {table} SET {assignments} WHERE {key} IN ('
+            f'SELECT {key} FROM {table} WHERE {bound}{condition} ORDER BY {key} LIMIT :size'
+            f') RETURNING {key}'
+        )
+
+    started = perf_counter()
+    last = None
+    # Вне PostgreSQL пачки выполняются в транзакции миграции
+    with op.get_context().autocommit_block() if _is_postgresql() else nullcontext():
+        connection = op.get_bind()
+        if _is_postgresql():
+            connection.exec_driver_sql(f"SET statement_timeout = '{statement_timeout}'")
+        while True:
+            stmt = batch_sql(last is not None)
+            keys = with_lock_retries(
+                lambda: connection.execute(stmt, {'last': last, 'size': batch_size}).scalars().all()
+            )
+            if not keys:
+                break
+            last = max(keys)
+            report.rows += len(keys)
+            report.batches += 1
+            report.seconds = perf_counter() - started
+            logger.info('backfill %r', report)
+            if progress is not None:
+                progress(report)
+            if len(keys) < batch_size:
+                break
+            if throttle:
+                sleep(throttle)
+        if _is_postgresql():
+            connection.exec_driver_sql('RESET statement_timeout')
+
+    report.seconds = perf_counter() - started
+    return report
+
+
+def add_column(table: str, column: sa.Column, *, backfill_values: dict[str, str] | None = None,
+               not_null: bool = False, **options) -> IngestReport | None:
+    """
+    Добавляет nullable-столбец (на PostgreSQL 11+ без переписывания таблицы, даже с DEFAULT-константой),
+    заполняет его backfill() и при not_null=True делает NOT NULL без долгой блокировки:
+    CHECK ... NOT VALID, VALIDATE вне транзакции, SET NOT NULL по проверенному CHECK (PostgreSQL 12+).
+    options передаются в backfill().
+    """
+
+    if not column.nullable:
+        raise ValueError(f'add_column({table}.{column.name}): add the column as nullable and pass not_null=True')
+
+    with_lock_retries(lambda: op.add_column(table, column))
+    report = backfill(table, backfill_values, **options) if backfill_values else None
+
+    if not_null:
+        if not _is_postgresql():
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column(column.name, nullable=False)
+            return report
+
+        check = f'ck_{table}_{column.name}_not_null'[:63]
+        with_lock_retries(lambda: op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column.name} IS NOT NULL) NOT VALID'
+        ))
+        with op.get_context().autocommit_block():
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check}')
+        with_lock_retries(lambda: op.alter_column(table, column.name, nullable=False))
+        with_lock_retries(lambda: op.drop_constraint(check, table, type_='check'))
+    return report
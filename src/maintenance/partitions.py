@@ -0,0 +1,169 @@
+import logging
+import re
+from datetime import date
+from time import sleep
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from src.config.engine import get_engine
+from src.maintenance.online_migrations import LOCK_NOT_AVAILABLE, LOCK_TIMEOUT
+from src.models import ManipulationFacts
+
+
+logger = logging.getLogger(__name__)
+
+
+# manipulation_facts на PostgreSQL секционирована по begin_time помесячно
+# (миграция b5d8e1f4a6c3): секция manipulation_facts_p2025_06 хранит июнь 2025 года.
+# Строки месяцев без своей секции попадают в DEFAULT-секцию manipulation_facts_default;
+# ensure_partitions() переносит их оттуда, когда создаёт секцию месяца.
+PARENT = ManipulationFacts.__tablename__
+DEFAULT_PARTITION = f'{PARENT}_default'
+_PARTITION_NAME = re.compile(rf'^{PARENT}_p(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'{PARENT}_p{month:%Y_%m}'
+
+
+def list_partitions(connection: Connection) -> dict[date, str]:
+    """ Присоединённые помесячные секции: {первое число месяца: имя секции} """
+
+    names = connection.execute(
+        text(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'WHERE parent.relname = :parent'
+        ),
+        {'parent': PARENT},
+    ).scalars()
+
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return dict(sorted(partitions.items()))
+
+
+def _create_partition(connection: Connection, month: date) -> str:
+    name = partition_name(month)
+    bounds = f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+    in_month = f"begin_time >= '{month}' AND begin_time < '{add_months(month, 1)}'"
+
+    has_default = connection.exec_driver_sql(f"SELECT to_regclass('{DEFAULT_PARTITION}')").scalar()
+    if has_default and connection.exec_driver_sql(
+        f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})'
+    ).scalar():
+        # Секцию нельзя создать, пока строки её месяца лежат в DEFAULT-секции:
+        # DEFAULT отсоединяется, строки переносятся, DEFAULT присоединяется обратно.
+        # Родительская таблица заблокирована, пока идёт перенос - обычно это немного строк.
+        connection.exec_driver_sql(f'ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}')
+        connection.exec_driver_sql(f'CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES {bounds}')
+        connection.exec_driver_sql(f'INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}')
+        connection.exec_driver_sql(f'DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}')
+        connection.exec_driver_sql(f'ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+    else:
+        connection.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} FOR VALUES {bounds}')
+    return name
+
+
+def ensure_partitions(connection: Connection, start: date, end: date) -> list[str]:
+    """
+    Создаёт недостающие секции для месяцев в [start, end), возвращает имена созданных.
+    Строки этих месяцев, попавшие в DEFAULT-секцию, переносятся в новые секции.
+    """
+
+    existing = list_partitions(connection)
+    created = []
+    month = month_start(start)
+    while month < end:
+        if month not in existing:
+            created.append(_create_partition(connection, month))
+        month = add_months(month, 1)
+    return created
+
+
+def _detach_partition(engine: Engine, name: str, archive_schema: str | None, drop: bool,
+                      lock_timeout: str, attempts: int, delay: float) -> None:
+    for attempt in range(1, attempts + 1):
+        try:
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+                connection.exec_driver_sql(f'ALTER TABLE {PARENT} DETACH PARTITION {name}')
+                if archive_schema:
+                    connection.exec_driver_sql(f'ALTER TABLE {name} SET SCHEMA {archive_schema}')
+                elif drop:
+                    connection.exec_driver_sql(f'DROP TABLE {name}')
+            return
+        except OperationalError as exc:
+            if getattr(exc.orig, 'pgcode', None) != LOCK_NOT_AVAILABLE or attempt == attempts:
+                raise
+            logger.warning('DETACH PARTITION %s: lock_timeout %s exceeded, attempt %d of %d',
+                           name, lock_timeout, attempt, attempts)
+            sleep(delay * 2 ** (attempt - 1))
+
+
+def detach_partitions(engine: Engine, before: date, archive_schema: str | None = 'archive',
+                      drop: bool = False, *, lock_timeout: str = LOCK_TIMEOUT, attempts: int = 5,
+                      delay: float = 1.0) -> list[str]:
+    """
+    Отсоединяет секции месяцев, закончившихся до before, и переносит их в схему
+    archive_schema. Без archive_schema секции удаляются, только если drop=True.
+
+    DETACH PARTITION ... CONCURRENTLY запрещён, пока у таблицы есть DEFAULT-секция,
+    поэтому каждая секция отсоединяется обычным DETACH в своей короткой транзакции:
+    он берёт ACCESS EXCLUSIVE на родительскую таблицу на миллисекунды, а lock_timeout
+    не даёт ему встать в очередь за долгой транзакцией и заблокировать все запросы.
+    Не дождавшись блокировки, попытка повторяется до attempts раз с растущей паузой.
+
+    После отсоединения эти месяцы пропадут и из отчётных агрегатов при следующем refresh().
+    """
+
+    with engine.connect() as connection:
+        old = [name for month, name in list_partitions(connection).items() if add_months(month, 1) <= before]
+
+    if old and archive_schema:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS {archive_schema}')
+    for name in old:
+        _detach_partition(engine, name, archive_schema, drop, lock_timeout, attempts, delay)
+    return old
+
+
+def maintain(key: str = 'postgresql', *, engine: Engine | None = None, months_ahead: int = 3,
+             retain_months: int | None = None, archive_schema: str | None = 'archive',
+             today: date | None = None) -> dict:
+    """
+    Плановое обслуживание секций: создаёт секции на months_ahead месяцев вперёд и,
+    если задан retain_months, отсоединяет и архивирует секции старше retain_months месяцев.
+    На базах без секционирования (SQLite) ничего не делает.
+
+    Запускать по расписанию (cron, планировщик задач) хотя бы раз в месяц: без этого новые
+    строки копятся в DEFAULT-секции, она не отсоединяется по месяцам, а создание секции
+    для уже заполненного месяца требует переноса строк под блокировкой таблицы.
+    """
+
+    engine = engine or get_engine(key)
+    report = {'created': [], 'detached': []}
+    if engine.dialect.name != 'postgresql':
+        return report
+
+    current = month_start(today or date.today())
+    with engine.begin() as connection:
+        report['created'] = ensure_partitions(connection, current, add_months(current, months_ahead + 1))
+    if retain_months is not None:
+        report['detached'] = detach_partitions(engine, add_months(current, -retain_months), archive_schema)
+    return report
@@ -1,5 +1,6 @@
 from src.models.base import Base
-from sqlalchemy import Column, Integer, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, Boolean, DateTime, Text, ForeignKey, Index
+from sqlalchemy.orm import relationship
 
 
 class ManipulationFacts(Base):
@@ -8,11 +9,23 @@ class ManipulationFacts(Base):
     """
 
     __tablename__ = 'manipulation_facts'
+    # На PostgreSQL таблица секционирована по begin_time помесячно (миграция b5d8e1f4a6c3,
+    # обслуживание секций - src/maintenance/partitions.py). Первичный ключ в базе там (id, begin_time).
+    # Строки месяцев без своей секции попадают в секцию manipulation_facts_default.
+    __table_args__ = (
+        # История процедур питомца: поиск по pet_id и сортировка/фильтр по времени.
+        # Отдельный индекс по pet_id не нужен - его покрывает левый столбец составного.
+        Index('ix_manipulation_facts_pet_id_begin_time', 'pet_id', 'begin_time'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    pet_id = Column(Integer, nullable=False)
-    manipulation_id = Column(Integer, nullable=False)
+    pet_id = Column(Integer, ForeignKey('pets.id', name='fk_manipulation_facts_pet_id_pets'), nullable=False)
+    manipulation_id = Column(Integer, ForeignKey('manipulations.manipulation_id', name='fk_manipulation_facts_manipulation_id_manipulations'), nullable=False, index=True)
     is_planned = Column(Boolean, default=True)
     begin_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=True)
-    result = Column(Text, nullable=True)
\ No newline at end of file
+    result = Column(Text, nullable=True)
+
+    manipulation = relationship('Manipulations', lazy='joined')
+    # Обратная ссылка: питомец почти всегда уже в identity map, lazy-загрузка берёт его оттуда без SQL
+    pet = relationship('Pets', back_populates='manipulation_facts', lazy='select')
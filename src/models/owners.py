@@ -1,5 +1,6 @@
 from src.models.base import Base
 from sqlalchemy import Column, String, Integer
+from sqlalchemy.orm import relationship
 
 
 class Owners(Base):
@@ -12,4 +13,7 @@ class Owners(Base):
     owner_phone = Column(String, nullable=True)
     owner_email = Column(String, nullable=True)
 
+    # Коллекции грузим отдельным SELECT ... WHERE owner_id IN (...): один запрос на всю пачку владельцев
+    pets = relationship('Pets', back_populates='owner', lazy='selectin')
+
 
@@ -1,5 +1,6 @@
 from src.models.base import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
 
 
 class Pets(Base):
@@ -10,9 +11,21 @@ class Pets(Base):
     __tablename__ = 'pets'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    species = Column(Integer, nullable=True)
-    owner_id = Column(Integer, nullable=True)
+    species = Column(Integer, ForeignKey('species.species_id', name='fk_pets_species_species'), nullable=True, index=True)
+    owner_id = Column(Integer, ForeignKey('owners.owner_id', name='fk_pets_owner_id_owners'), nullable=True, index=True)
     name = Column(String, nullable=False)
     sex = Column(String, default='Male')
     weight = Column(Float, nullable=True)
-    birthdate = Column(DateTime, nullable=True)
\ No newline at end of file
+    birthdate = Column(DateTime, nullable=True)
+
+    # Владелец: питомцы обычно загружаются из Owners.pets, и lazy-загрузка берёт владельца
+    # из identity map без SQL; JOIN к owners в каждом запросе питомцев был бы лишним
+    owner = relationship('Owners', back_populates='pets', lazy='select')
+    # Небольшой справочник подтягиваем LEFT JOIN в том же запросе
+    species_ref = relationship('Species', lazy='joined')
+    # История процедур растёт без ограничений и по умолчанию не загружается;
+    # когда она нужна - with_loading(stmt, {Pets.manipulation_facts: 'selectin'})
+    manipulation_facts = relationship(
+        'ManipulationFacts', back_populates='pet', lazy='select', order_by='ManipulationFacts.begin_time'
+    )
+
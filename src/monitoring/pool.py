@@ -0,0 +1,238 @@
+from bisect import bisect_left
+from collections import deque
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+from src.config.engine import get_engine
+
+
+# Событий "начало ожидания соединения" у пула нет, поэтому время выдачи соединения
+# меряется обёрткой над Pool._do_get() - в нём и ожидание свободного соединения,
+# и установка нового. После engine.dispose() пул пересоздаётся, и слушателей
+# нужно подключить заново.
+
+def listen_checkout_wait(pool: Pool, fn: Callable[[float], None]) -> None:
+    """ fn(seconds) вызывается после каждой выдачи соединения из пула """
+
+    listeners = pool.__dict__.get('_checkout_wait_listeners')
+    if listeners is None:
+        listeners = pool._checkout_wait_listeners = []
+        do_get = pool._do_get
+
+        def timed_do_get():
+            started = perf_counter()
+            try:
+                return do_get()
+            finally:
+                waited = perf_counter() - started
+                for listener in list(listeners):
+                    listener(waited)
+
+        pool._do_get = timed_do_get
+    listeners.append(fn)
+
+
+def remove_checkout_wait(pool: Pool, fn: Callable[[float], None]) -> None:
+    listeners = pool.__dict__.get('_checkout_wait_listeners', [])
+    if fn in listeners:
+        listeners.remove(fn)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def resize_pool(pool: QueuePool, size: int) -> None:
+    """
+    Меняет pool_size работающего QueuePool. Предел соединений остаётся size + max_overflow;
+    лишние простаивающие соединения при уменьшении закрываются сразу.
+    """
+
+    with pool._overflow_lock:
+        delta = size - pool._pool.maxsize
+        pool._pool.maxsize = size
+        pool._overflow -= delta
+    while pool._pool.qsize() > size:
+        try:
+            record = pool._pool.get(False)
+        except Exception:
+            break
+        try:
+            record.close()
+        finally:
+            pool._dec_overflow()
+
+
+class PoolTelemetry:
+    """
+    Метрики пула соединений движка: выдано, простаивает, overflow, гистограмма
+    ожидания соединения, возраст соединений, число установленных и инвалидированных.
+    Счётчики берутся из событий пула, текущее состояние - из самого пула в момент snapshot().
+    """
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, buckets_ms: tuple[float, ...] = BUCKETS_MS, samples: int = 1024):
+        self.buckets_ms = tuple(buckets_ms)
+        self._histogram = [0] * (len(self.buckets_ms) + 1)
+        self._waits = deque(maxlen=samples)
+        self._created: dict[int, float] = {}
+        self._counters = dict.fromkeys(
+            ('connects', 'checkouts', 'checkins', 'invalidations', 'soft_invalidations', 'closes'), 0
+        )
+        self._lock = Lock()
+        self.engine: Engine | None = None
+        self.sizer: AdaptivePoolSizer | None = None
+
+    def attach(self, engine: Engine) -> 'PoolTelemetry':
+        self.engine = engine
+        for name in ('connect', 'checkout', 'checkin', 'invalidate', 'soft_invalidate', 'close'):
+            event.listen(engine, name, getattr(self, f'_on_{name}'))
+        listen_checkout_wait(engine.pool, self._on_checkout_wait)
+        return self
+
+    def detach(self) -> None:
+        for name in ('connect', 'checkout', 'checkin', 'invalidate', 'soft_invalidate', 'close'):
+            event.remove(self.engine, name, getattr(self, f'_on_{name}'))
+        remove_checkout_wait(self.engine.pool, self._on_checkout_wait)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _on_connect(self, dbapi_connection, record) -> None:
+        with self._lock:
+            self._counters['connects'] += 1
+            self._created[id(record)] = monotonic()
+
+    def _on_checkout(self, dbapi_connection, record, proxy) -> None:
+        self._count('checkouts')
+
+    def _on_checkin(self, dbapi_connection, record) -> None:
+        self._count('checkins')
+
+    def _on_invalidate(self, dbapi_connection, record, exception) -> None:
+        self._count('invalidations')
+
+    def _on_soft_invalidate(self, dbapi_connection, record, exception) -> None:
+        self._count('soft_invalidations')
+
+    def _on_close(self, dbapi_connection, record) -> None:
+        with self._lock:
+            self._counters['closes'] += 1
+            self._created.pop(id(record), None)
+
+    def _on_checkout_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._histogram[bisect_left(self.buckets_ms, seconds * 1000)] += 1
+            self._waits.append(seconds)
+
+    def snapshot(self) -> dict:
+        """ Текущее состояние пула и накопленные счётчики; время ожидания - в миллисекундах """
+
+        pool = self.engine.pool
+        now = monotonic()
+        with self._lock:
+            ages = [now - created for created in self._created.values()]
+            waits = list(self._waits)
+            labels = [f'<={bound}ms' for bound in self.buckets_ms] + [f'>{self.buckets_ms[-1]}ms']
+            histogram = dict(zip(labels, self._histogram))
+            counters = dict(self._counters)
+
+        size = pool.size() if isinstance(pool, QueuePool) else None
+        return {
+            'size': size,
+            'max_overflow': pool._max_overflow if isinstance(pool, QueuePool) else None,
+            'checked_out': pool.checkedout() if isinstance(pool, QueuePool) else None,
+            'idle': pool.checkedin() if isinstance(pool, QueuePool) else None,
+            'overflow': max(pool.overflow(), 0) if isinstance(pool, QueuePool) else None,
+            'connections': len(ages),
+            'connection_age_s': {
+                'mean': sum(ages) / len(ages) if ages else 0.0,
+                'max': max(ages, default=0.0),
+            },
+            'wait_ms': {
+                'p50': percentile(waits, 0.50) * 1000,
+                'p95': percentile(waits, 0.95) * 1000,
+                'p99': percentile(waits, 0.99) * 1000,
+                'max': max(waits, default=0.0) * 1000,
+                'histogram': histogram,
+            },
+            **counters,
+        }
+
+
+class AdaptivePoolSizer:
+    """
+    Подстраивает pool_size под наблюдаемое ожидание соединения: раз в interval секунд
+    (проверяется при выдаче соединений) при p95 ожидания выше grow_wait_ms пул растёт
+    на step, при p95 ниже shrink_wait_ms и простаивающих соединениях - уменьшается,
+    всегда в пределах [min_size, max_size].
+    """
+
+    def __init__(self, engine: Engine, min_size: int, max_size: int, *, grow_wait_ms: float = 50,
+                 shrink_wait_ms: float = 1, step: int = 2, interval: float = 10.0):
+        if not isinstance(engine.pool, QueuePool):
+            raise TypeError(f'Adaptive sizing requires QueuePool, not {type(engine.pool).__name__}')
+        self.engine = engine
+        self.min_size = min_size
+        self.max_size = max_size
+        self.grow_wait_ms = grow_wait_ms
+        self.shrink_wait_ms = shrink_wait_ms
+        self.step = step
+        self.interval = interval
+        self.resizes: deque[tuple[float, int, int]] = deque(maxlen=100)
+        self._waits: list[float] = []
+        self._checked_at = monotonic()
+        self._lock = Lock()
+        listen_checkout_wait(engine.pool, self._on_checkout_wait)
+
+    def detach(self) -> None:
+        remove_checkout_wait(self.engine.pool, self._on_checkout_wait)
+
+    def _on_checkout_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._waits.append(seconds)
+            now = monotonic()
+            if now - self._checked_at < self.interval:
+                return
+            waits, self._waits, self._checked_at = self._waits, [], now
+        self.adjust(percentile(waits, 0.95) * 1000)
+
+    def adjust(self, p95_wait_ms: float) -> int:
+        """ Применяет правило роста/уменьшения к значению p95 ожидания, возвращает новый размер """
+
+        pool = self.engine.pool
+        size = pool.size()
+        if p95_wait_ms > self.grow_wait_ms:
+            target = min(size + self.step, self.max_size)
+        elif p95_wait_ms < self.shrink_wait_ms and pool.checkedin() >= self.step:
+            target = max(size - self.step, self.min_size)
+        else:
+            target = size
+        if target != size:
+            resize_pool(pool, target)
+            self.resizes.append((monotonic(), size, target))
+        return target
+
+
+def instrument_pool(key: str = 'postgresql', *, adaptive: bool = False, min_size: int = 5,
+                    max_size: int = 50, **options) -> PoolTelemetry:
+    """
+    Подключает PoolTelemetry к общему движку для ключа из DB_URL; при adaptive=True
+    размер пула дополнительно подстраивается AdaptivePoolSizer (options - его настройки).
+    """
+
+    engine = get_engine(key)
+    telemetry = PoolTelemetry().attach(engine)
+    if adaptive:
+        telemetry.sizer = AdaptivePoolSizer(engine, min_size, max_size, **options)
+    return telemetry
@@ -0,0 +1,175 @@
+import logging
+import re
+from collections import deque
+from threading import Lock
+from time import perf_counter
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config.engine import get_engine
+from src.monitoring.pool import listen_checkout_wait, percentile, remove_checkout_wait
+
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\$\d+|\?')
+_PLACEHOLDER_LIST = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+_VALUES_LIST = re.compile(r'\(\?\)(?:\s*,\s*\(\?\))+')
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Приводит SQL к виду, общему для всех вызовов одного запроса:
+    плейсхолдеры драйверов заменяются на ?, списки IN (...) и VALUES (...), (...)
+    разной длины сворачиваются.
+    """
+
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _PLACEHOLDER.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(?)', statement)
+    return _VALUES_LIST.sub('(?)', statement)
+
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> str:
+    """ Параметры без значений: только имена и типы """
+
+    if executemany:
+        return f'<{len(parameters)} parameter sets>'
+    if isinstance(parameters, dict):
+        return repr({name: f'<{type(value).__name__}>' for name, value in parameters.items()})
+    if isinstance(parameters, (list, tuple)):
+        return repr([f'<{type(value).__name__}>' for value in parameters])
+    return '<?>'
+
+
+class _StatementStats:
+    __slots__ = ('calls', 'total', 'max', 'rows', 'samples')
+
+    def __init__(self, samples: int):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=samples)
+
+
+class QueryStats:
+    """
+    Счётчики запросов движка: число вызовов, перцентили времени выполнения и
+    число строк по каждому нормализованному запросу, время ожидания соединения
+    из пула. Запросы дольше slow_threshold_ms пишутся в лог без значений параметров.
+
+    rows - rowcount драйвера: psycopg2 сообщает его и для SELECT, sqlite3 - только для DML.
+    Перцентили считаются по последним samples замерам.
+    """
+
+    def __init__(self, slow_threshold_ms: float = 500, samples: int = 1024):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.samples = samples
+        self._statements: dict[str, _StatementStats] = {}
+        self._checkout_waits = deque(maxlen=samples)
+        self._checkouts = 0
+        self._checkout_total = 0.0
+        self._slow = 0
+        self._lock = Lock()
+
+    def attach(self, engine: Engine) -> 'QueryStats':
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        listen_checkout_wait(engine.pool, self._on_checkout_wait)
+        return self
+
+    def detach(self, engine: Engine) -> None:
+        event.remove(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.remove(engine, 'after_cursor_execute', self._after_cursor_execute)
+        remove_checkout_wait(engine.pool, self._on_checkout_wait)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Время начала хранится в контексте выполнения: after_cursor_execute не вызывается
+        # для упавшего запроса, и на соединении из пула оно копилось бы без конца
+        if context is not None:
+            context.query_stats_started = perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'query_stats_started', None)
+        if started is None:
+            return
+        elapsed = perf_counter() - started
+        key = normalize_statement(statement)
+        rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else 0
+
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = _StatementStats(self.samples)
+            stats.calls += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.rows += rowcount
+            stats.samples.append(elapsed)
+            slow = elapsed * 1000 >= self.slow_threshold_ms
+            if slow:
+                self._slow += 1
+
+        if slow:
+            logger.warning('Slow query %.1f ms: %s; parameters: %s',
+                           elapsed * 1000, key, redact_parameters(parameters, executemany))
+
+    def _on_checkout_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._checkouts += 1
+            self._checkout_total += seconds
+            self._checkout_waits.append(seconds)
+
+    def snapshot(self) -> dict:
+        """ Текущее состояние счётчиков; время - в миллисекундах """
+
+        with self._lock:
+            statements = {
+                key: {
+                    'calls': stats.calls,
+                    'rows': stats.rows,
+                    'total_ms': stats.total * 1000,
+                    'mean_ms': stats.total / stats.calls * 1000,
+                    'p50_ms': percentile(list(stats.samples), 0.50) * 1000,
+                    'p95_ms': percentile(list(stats.samples), 0.95) * 1000,
+                    'p99_ms': percentile(list(stats.samples), 0.99) * 1000,
+                    'max_ms': stats.max * 1000,
+                }
+                for key, stats in self._statements.items()
+            }
+            waits = list(self._checkout_waits)
+            return {
+                'statements': statements,
+                'pool_checkout': {
+                    'checkouts': self._checkouts,
+                    'total_wait_ms': self._checkout_total * 1000,
+                    'p50_wait_ms': percentile(waits, 0.50) * 1000,
+                    'p95_wait_ms': percentile(waits, 0.95) * 1000,
+                    'max_wait_ms': max(waits, default=0.0) * 1000,
+                },
+                'slow_queries': self._slow,
+            }
+
+    def top(self, n: int = 10, by: str = 'total_ms') -> list[tuple[str, dict]]:
+        """ Самые "тяжёлые" запросы по выбранной метрике снимка """
+
+        statements = self.snapshot()['statements']
+        return sorted(statements.items(), key=lambda item: item[1][by], reverse=True)[:n]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._checkout_waits.clear()
+            self._checkouts = 0
+            self._checkout_total = 0.0
+            self._slow = 0
+
+
+def instrument(key: str = 'postgresql', **options) -> QueryStats:
+    """ Подключает QueryStats к общему движку для ключа из DB_URL """
+
+    return QueryStats(**options).attach(get_engine(key))
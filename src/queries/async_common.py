@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.async_session import async_session_scope
+from src.models import ManipulationFacts, Owners, Pets
+from src.queries.registry import registry
+
+
+async def _execute(session: AsyncSession, name: str, **params):
+    registry.attach(session.get_bind())
+    return await session.execute(registry.statement(name), params, execution_options=registry.execution_options(name))
+
+
+async def get_pet(session: AsyncSession, pet_id: int) -> Pets | None:
+    """ Питомец по id (сначала ищется в identity map сессии) """
+
+    return await session.get(Pets, pet_id)
+
+
+async def get_owner_with_pets(session: AsyncSession, owner_id: int) -> Owners | None:
+    """ Владелец вместе с его питомцами """
+
+    return (await _execute(session, 'owner_with_pets', owner_id=owner_id)).scalars().first()
+
+
+async def get_pets_of_owner(session: AsyncSession, owner_id: int) -> list[Pets]:
+    """ Питомцы владельца """
+
+    return list((await _execute(session, 'pets_of_owner', owner_id=owner_id)).scalars())
+
+
+async def get_pet_history(session: AsyncSession, pet_id: int, since: datetime | None = None,
+                          until: datetime | None = None) -> list[ManipulationFacts]:
+    """ Процедуры питомца за период [since, until) по времени начала """
+
+    result = await _execute(session, 'pet_history', pet_id=pet_id,
+                            since=since or datetime.min, until=until or datetime.max)
+    return list(result.scalars())
+
+
+async def gather_queries(query: Callable[..., Awaitable[Any]], arguments: Iterable[tuple],
+                         key: str = 'postgresql') -> list[Any]:
+    """
+    Выполняет query(session, *args) для каждого набора аргументов конкурентно,
+    каждый вызов - в своей сессии. Число одновременных запросов ограничено пулом движка
+    (pool_size + max_overflow).
+
+        pets = await gather_queries(get_pet, [(1,), (2,), (3,)])
+    """
+
+    async def run(args: tuple) -> Any:
+        async with async_session_scope(key) as session:
+            return await query(session, *args)
+
+    return await asyncio.gather(*(run(args) for args in arguments))
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from src.models import ManipulationFacts, Owners, Pets
+from src.queries.registry import registry
+
+
+# Запросы берутся из реестра (src/queries/registry.py): они не строятся заново
+# на каждый вызов и всегда попадают в кэш скомпилированных запросов.
+# Асинхронные версии - в src/queries/async_common.py.
+
+def get_pet(session: Session, pet_id: int) -> Pets | None:
+    """ Питомец по id (сначала ищется в identity map сессии) """
+
+    return session.get(Pets, pet_id)
+
+
+def get_owner_with_pets(session: Session, owner_id: int) -> Owners | None:
+    """ Владелец вместе с его питомцами """
+
+    return registry.execute(session, 'owner_with_pets', owner_id=owner_id).scalars().first()
+
+
+def get_pets_of_owner(session: Session, owner_id: int) -> list[Pets]:
+    """ Питомцы владельца """
+
+    return list(registry.execute(session, 'pets_of_owner', owner_id=owner_id).scalars())
+
+
+def get_pet_history(session: Session, pet_id: int, since: datetime | None = None,
+                    until: datetime | None = None) -> list[ManipulationFacts]:
+    """ Процедуры питомца за период [since, until) по времени начала """
+
+    result = registry.execute(session, 'pet_history', pet_id=pet_id,
+                              since=since or datetime.min, until=until or datetime.max)
+    return list(result.scalars())
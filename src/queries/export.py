@@ -0,0 +1,204 @@
+import os
+from threading import Thread
+from typing import Iterator
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Select, String, Time
+from sqlalchemy.engine import Connection, Engine
+
+from src.config.engine import get_engine
+
+
+# Размер блока CSV, который pyarrow разбирает за раз при выгрузке через COPY:
+# от него зависит число строк в RecordBatch и пиковая память
+COPY_BLOCK_SIZE = 16 << 20
+
+
+def _arrow():
+    # pyarrow импортируется при первой выгрузке, а не при импорте модуля
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImportError('columnar export requires pyarrow: pip install pyarrow') from exc
+    return pyarrow
+
+
+def arrow_type(sql_type):
+    """ Тип Arrow для типа столбца SQLAlchemy; None - пусть pyarrow выведет тип сам """
+
+    pa = _arrow()
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp('us', tz='UTC' if sql_type.timezone else None)
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    if isinstance(sql_type, Time):
+        return pa.time64('us')
+    if isinstance(sql_type, String):
+        return pa.string()
+    return None
+
+
+def arrow_schema(stmt: Select):
+    """ Схема результата запроса; столбцы неизвестных типов получают тип null до первой пачки """
+
+    pa = _arrow()
+    return pa.schema([
+        (column.key, arrow_type(column.type) or pa.null()) for column in stmt.selected_columns
+    ])
+
+
+def _cursor_batches(connection: Connection, stmt: Select, batch_size: int) -> Iterator:
+    # Серверный курсор, пачка строк транспонируется в столбцы и целиком передаётся в pyarrow
+    pa = _arrow()
+    names = [column.key for column in stmt.selected_columns]
+    types = [arrow_type(column.type) for column in stmt.selected_columns]
+
+    result = connection.execute(stmt, execution_options={'stream_results': True, 'yield_per': batch_size})
+    try:
+        for partition in result.partitions():
+            arrays = [pa.array(values, type=type_) for values, type_ in zip(zip(*partition), types)]
+            # Тип, выведенный по первой пачке, закрепляется: схема всех пачек должна совпадать
+            types = [type_ or (array.type if array.null_count < len(array) else None)
+                     for type_, array in zip(types, arrays)]
+            yield pa.RecordBatch.from_arrays(arrays, names=names)
+    finally:
+        result.close()
+
+
+def _copy_batches(connection: Connection, stmt: Select) -> Iterator:
+    # PostgreSQL + psycopg2: COPY (SELECT ...) TO STDOUT отдаёт CSV, который pyarrow разбирает
+    # сразу в столбцы - объекты Python для отдельных строк не создаются вовсе.
+    # copy_expert пишет в pipe из отдельного потока, основной поток читает из него пачками.
+    from pyarrow import csv, types
+
+    schema = arrow_schema(stmt)
+    compiled = stmt.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    dbapi_connection = connection.connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        query = cursor.mogrify(compiled.string, compiled.params).decode()
+
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def produce():
+        try:
+            with os.fdopen(write_fd, 'wb') as sink, dbapi_connection.cursor() as cursor:
+                cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT csv)', sink)
+        except BaseException as exc:
+            errors.append(exc)
+
+    producer = Thread(target=produce, name='copy-export', daemon=True)
+    producer.start()
+    finished = False
+    try:
+        with os.fdopen(read_fd, 'rb') as source:
+            reader = csv.open_csv(
+                source,
+                read_options=csv.ReadOptions(column_names=schema.names, block_size=COPY_BLOCK_SIZE),
+                convert_options=csv.ConvertOptions(
+                    column_types={field.name: field.type for field in schema if not types.is_null(field.type)},
+                    null_values=[''], strings_can_be_null=True, quoted_strings_can_be_null=False,
+                    true_values=['t'], false_values=['f'],
+                ),
+            )
+            yield from reader
+        finished = True
+    except Exception:
+        # Ошибка разбора обычно следствие оборванного COPY: наружу отдаём ошибку сервера
+        producer.join()
+        if errors:
+            raise errors[0]
+        raise
+    finally:
+        producer.join()
+        if errors and not finished:
+            # Чтение прервано посреди COPY: соединение в неопределённом состоянии
+            connection.invalidate()
+        elif errors:
+            raise errors[0]
+
+
+def record_batches(stmt: Select, *, batch_size: int = 65536, use_copy: bool | None = None,
+                   key: str = 'postgresql', engine: Engine | None = None) -> Iterator:
+    """
+    Выполняет select() и отдаёт результат пачками pyarrow.RecordBatch; в памяти
+    одновременно находится одна пачка.
+
+    На PostgreSQL с psycopg2 данные идут через COPY (...) TO STDOUT и разбираются
+    pyarrow без создания строк в Python (размер пачки задаёт COPY_BLOCK_SIZE),
+    на остальных базах - через серверный курсор по batch_size строк.
+    Для select(Model) выгружаются столбцы таблицы без relationship.
+    """
+
+    engine = engine or get_engine(key)
+    if use_copy is None:
+        use_copy = engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+
+    with engine.connect() as connection:
+        if use_copy:
+            yield from _copy_batches(connection, stmt)
+        else:
+            yield from _cursor_batches(connection, stmt, batch_size)
+
+
+def to_arrow(stmt: Select, **options):
+    """ Весь результат запроса одной таблицей pyarrow.Table """
+
+    pa = _arrow()
+    batches = list(record_batches(stmt, **options))
+    if not batches:
+        return arrow_schema(stmt).empty_table()
+    return pa.Table.from_batches(batches)
+
+
+def to_numpy(stmt: Select, **options) -> dict:
+    """ Результат запроса столбцами: {имя столбца: numpy.ndarray} """
+
+    table = to_arrow(stmt, **options)
+    return {name: table.column(name).to_numpy() for name in table.column_names}
+
+
+def write_parquet(stmt: Select, path, *, compression: str = 'zstd', **options) -> int:
+    """ Потоково пишет результат запроса в Parquet, возвращает число строк """
+
+    from pyarrow import parquet
+
+    rows = 0
+    writer = None
+    try:
+        for batch in record_batches(stmt, **options):
+            if writer is None:
+                writer = parquet.ParquetWriter(path, batch.schema, compression=compression)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is None:
+            parquet.write_table(arrow_schema(stmt).empty_table(), path, compression=compression)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_feather(stmt: Select, path, *, compression: str = 'zstd', **options) -> int:
+    """ Потоково пишет результат запроса в Feather (Arrow IPC), возвращает число строк """
+
+    pa = _arrow()
+    rows = 0
+    writer = None
+    try:
+        for batch in record_batches(stmt, **options):
+            if writer is None:
+                writer = pa.ipc.new_file(path, batch.schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is None:
+            pa.ipc.new_file(path, arrow_schema(stmt)).close()
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
@@ -0,0 +1,56 @@
+from typing import Any, Mapping
+
+from sqlalchemy import Select
+from sqlalchemy.orm import (
+    defaultload,
+    immediateload,
+    joinedload,
+    lazyload,
+    noload,
+    raiseload,
+    selectinload,
+    subqueryload,
+)
+
+
+# Стратегии загрузки отношений, доступные для переопределения в запросе
+LOADERS = {
+    'selectin': selectinload,
+    'joined': joinedload,
+    'subquery': subqueryload,
+    'immediate': immediateload,
+    'lazy': lazyload,
+    'raise': raiseload,
+    'noload': noload,
+}
+
+
+def loader_option(path, strategy: str):
+    """
+    Опция загрузки для отношения или цепочки отношений.
+    Промежуточные звенья цепочки сохраняют стратегию по умолчанию:
+
+        loader_option((Owners.pets, Pets.manipulation_facts), 'raise')
+    """
+
+    if strategy not in LOADERS:
+        raise ValueError(f'Неизвестная стратегия загрузки: {strategy!r}, доступны: {", ".join(LOADERS)}')
+
+    *parents, target = path if isinstance(path, tuple) else (path,)
+    if not parents:
+        return LOADERS[strategy](target)
+
+    option = defaultload(parents[0])
+    for attr in parents[1:]:
+        option = option.defaultload(attr)
+    return getattr(option, LOADERS[strategy].__name__)(target)
+
+
+def with_loading(stmt: Select, loaders: Mapping[Any, str]) -> Select:
+    """
+    Переопределяет стратегии загрузки отношений для одного запроса:
+
+        with_loading(select(Pets), {Pets.manipulation_facts: 'selectin', Pets.owner: 'joined'})
+    """
+
+    return stmt.options(*(loader_option(path, strategy) for path, strategy in loaders.items()))
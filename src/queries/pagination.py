@@ -0,0 +1,128 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Sequence
+
+from sqlalchemy import Row, Select, tuple_
+from sqlalchemy.orm import Session
+
+from src.queries.streaming import selects_single_entity
+
+
+class Page:
+    """ Страница результата и курсоры соседних страниц """
+
+    def __init__(self, items: list, next_cursor: str | None, prev_cursor: str | None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return f'<Page {len(self.items)} items, next={self.next_cursor!r}, prev={self.prev_cursor!r}>'
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+
+def encode_cursor(values: Sequence[Any], direction: str) -> str:
+    """ Непрозрачный курсор: значения ключа граничной строки и направление перехода """
+
+    payload = json.dumps({'k': [_encode_value(value) for value in values], 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[list[Any], str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, direction = [_decode_value(value) for value in payload['k']], payload['d']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f'Некорректный курсор страницы: {cursor!r}') from e
+    if direction not in ('next', 'prev'):
+        raise ValueError(f'Некорректный курсор страницы: {cursor!r}')
+    return values, direction
+
+
+def _key_values(item: Any, keys: Sequence) -> tuple:
+    if isinstance(item, Row):
+        return tuple(item._mapping[key] for key in keys)
+    return tuple(getattr(item, key.key) for key in keys)
+
+
+def paginate(
+        session: Session,
+        stmt: Select,
+        keys: Sequence,
+        *,
+        page_size: int = 50,
+        cursor: str | None = None,
+        descending: bool = False,
+) -> Page:
+    """
+    Keyset-пагинация: вместо OFFSET страница начинается с условия
+    (k1, k2, ...) > (значения последней строки), поэтому стоимость
+    глубокой страницы не зависит от её номера.
+
+    keys - упорядоченный уникальный ключ, например [Pets.id] или
+    [ManipulationFacts.begin_time, ManipulationFacts.id]. Сортировку
+    по keys paginate() добавляет сам, в stmt её быть не должно.
+    """
+
+    keys = list(keys)
+    forward = True
+    if cursor is not None:
+        values, direction = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError('Курсор построен для другого набора ключей')
+        forward = direction == 'next'
+
+        key_expr = keys[0] if len(keys) == 1 else tuple_(*keys)
+        bound = values[0] if len(keys) == 1 else tuple_(*values)
+        # Вперёд по возрастанию или назад по убыванию - строки "после" границы
+        stmt = stmt.where(key_expr > bound if forward != descending else key_expr < bound)
+
+    ascending = forward != descending
+    stmt = stmt.order_by(None).order_by(*(key.asc() if ascending else key.desc() for key in keys))
+    stmt = stmt.limit(page_size + 1)
+
+    result = session.execute(stmt)
+    items = list(result.scalars() if selects_single_entity(stmt) else result)
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if not forward:
+        items.reverse()
+
+    if not items:
+        return Page(items, None, None)
+
+    has_next = has_more if forward else True
+    has_prev = cursor is not None if forward else has_more
+    return Page(
+        items,
+        encode_cursor(_key_values(items[-1], keys), 'next') if has_next else None,
+        encode_cursor(_key_values(items[0], keys), 'prev') if has_prev else None,
+    )
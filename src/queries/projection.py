@@ -0,0 +1,59 @@
+from collections import namedtuple
+from functools import lru_cache, partial
+from typing import Iterator
+
+from sqlalchemy import Select, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+
+@lru_cache(maxsize=None)
+def row_class(model, names: tuple[str, ...]) -> type:
+    """
+    Класс строки для набора столбцов модели: namedtuple с __slots__ = (),
+    поля доступны по имени (row.name) и по индексу. Один класс на модель и набор столбцов.
+    """
+
+    return namedtuple(f'{model.__name__}Row', names)
+
+
+def project(stmt: Select, *columns) -> tuple[Select, type]:
+    """
+    select(Model) с любыми where / join / order_by / limit -> select(столбцы Model)
+    с теми же условиями и класс строк для результата.
+
+    columns - атрибуты модели или их имена; по умолчанию все столбцы модели.
+    """
+
+    model = stmt.column_descriptions[0]['entity']
+    if columns:
+        attrs = [getattr(model, column) if isinstance(column, str) else column for column in columns]
+    else:
+        attrs = [getattr(model, prop.key) for prop in inspect(model).column_attrs]
+    names = tuple(attr.key for attr in attrs)
+    return stmt.with_only_columns(*attrs, maintain_column_froms=True), row_class(model, names)
+
+
+def _connection(executor: Session | Connection) -> Connection:
+    # Запрос выполняется на уровне Core: без identity map, состояния объектов и eager-загрузки
+    return executor.connection() if isinstance(executor, Session) else executor
+
+
+def fetch_rows(executor: Session | Connection, stmt: Select, *columns) -> list:
+    """ Результат select(Model) лёгкими строками row_class() вместо объектов ORM """
+
+    stmt, cls = project(stmt, *columns)
+    return list(map(partial(tuple.__new__, cls), _connection(executor).execute(stmt)))
+
+
+def stream_rows(executor: Session | Connection, stmt: Select, *columns, size: int = 1000) -> Iterator:
+    """ То же, что fetch_rows(), но через серверный курсор по size строк """
+
+    stmt, cls = project(stmt, *columns)
+    make = partial(tuple.__new__, cls)
+    result = _connection(executor).execute(stmt, execution_options={'yield_per': size})
+    try:
+        for partition in result.partitions():
+            yield from map(make, partition)
+    finally:
+        result.close()
@@ -0,0 +1,173 @@
+import hashlib
+import re
+from threading import Lock
+from typing import Any, Callable
+
+from sqlalchemy import bindparam, event, lambda_stmt, select
+from sqlalchemy.engine import Engine, Result
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import StatementLambdaElement
+
+from src.models import ManipulationFacts, Owners, Pets
+
+
+_PYFORMAT = re.compile(r'%\((\w+)\)s|%%')
+
+
+def to_prepared(statement: str) -> tuple[str, list[str]]:
+    """ SQL в формате psycopg2 (%(name)s) -> текст для PREPARE ($1, $2, ...) и порядок параметров """
+
+    order: list[str] = []
+
+    def replace(match):
+        if match.group(0) == '%%':
+            return '%'
+        name = match.group(1)
+        if name not in order:
+            order.append(name)
+        return f'${order.index(name) + 1}'
+
+    return _PYFORMAT.sub(replace, statement), order
+
+
+class _QueryStats:
+    __slots__ = ('executions', 'cache_hits', 'cache_misses', 'prepares', 'prepared_executions')
+
+    def __init__(self):
+        self.executions = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.prepares = 0
+        self.prepared_executions = 0
+
+
+class QueryRegistry:
+    """
+    Реестр заранее построенных параметризованных запросов для горячих путей.
+
+    Запросы строятся один раз как lambda_stmt с bindparam, поэтому ключ кэша
+    скомпилированных запросов SQLAlchemy всегда совпадает и компиляция не повторяется.
+    На PostgreSQL с psycopg2 запрос готовится на сервере (PREPARE) один раз на соединение
+    и дальше выполняется через EXECUTE. asyncpg готовит запросы сам, а sqlite3 держит
+    собственный кэш подготовленных выражений.
+    """
+
+    def __init__(self):
+        self._statements: dict[str, StatementLambdaElement] = {}
+        self._stats: dict[str, _QueryStats] = {}
+        self._engines: set[Engine] = set()
+        self._lock = Lock()
+
+    def register(self, name: str, build: Callable[[], Any]) -> None:
+        """ build() возвращает select() с bindparam вместо значений """
+
+        self._statements[name] = lambda_stmt(build)
+        self._stats[name] = _QueryStats()
+
+    def statement(self, name: str) -> StatementLambdaElement:
+        return self._statements[name]
+
+    def execution_options(self, name: str) -> dict:
+        return {'registry_query': name}
+
+    def execute(self, session: Session, name: str, **params) -> Result:
+        """ Выполняет запрос реестра в сессии; для AsyncSession используйте statement() и execution_options() """
+
+        self.attach(session.get_bind())
+        return session.execute(self._statements[name], params, execution_options=self.execution_options(name))
+
+    def attach(self, engine: Engine) -> None:
+        """ Подключает счётчики кэша и подготовку запросов к движку (повторный вызов ничего не делает) """
+
+        engine = engine.engine  # сессия может быть привязана к Connection
+        with self._lock:
+            if engine in self._engines:
+                return
+            self._engines.add(engine)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        if engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2':
+            event.listen(engine, 'do_execute', self._do_execute_prepared)
+
+    def _query_name(self, context) -> str | None:
+        # execution_options наследуют и дочерние запросы (eager-загрузка отношений),
+        # поэтому сверяем сам выполняемый объект запроса
+        name = context.execution_options.get('registry_query') if context is not None else None
+        if name is not None and context.invoked_statement is self._statements.get(name):
+            return name
+        return None
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        name = self._query_name(context)
+        if name is None:
+            return
+        with self._lock:
+            stats = self._stats[name]
+            stats.executions += 1
+            if context.cache_hit is CACHE_HIT:
+                stats.cache_hits += 1
+            elif context.cache_hit is CACHE_MISS:
+                stats.cache_misses += 1
+
+    def _do_execute_prepared(self, cursor, statement, parameters, context):
+        name = self._query_name(context)
+        if name is None or not isinstance(parameters, dict):
+            return None
+
+        sql, order = to_prepared(statement)
+        prepared_name = f'q_{name}_{hashlib.sha1(sql.encode()).hexdigest()[:12]}'
+        # info живёт вместе с DBAPI-соединением, подготовленные запросы - тоже
+        prepared = context.root_connection.connection.info.setdefault('prepared_statements', set())
+        if prepared_name not in prepared:
+            cursor.execute(f'PREPARE {prepared_name} AS {sql}')
+            prepared.add(prepared_name)
+            with self._lock:
+                self._stats[name].prepares += 1
+
+        if order:
+            placeholders = ', '.join(['%s'] * len(order))
+            cursor.execute(f'EXECUTE {prepared_name} ({placeholders})', [parameters[key] for key in order])
+        else:
+            cursor.execute(f'EXECUTE {prepared_name}')
+        with self._lock:
+            self._stats[name].prepared_executions += 1
+        return True
+
+    def stats(self) -> dict:
+        """ Счётчики по каждому запросу реестра и доля попаданий в кэш скомпилированных запросов """
+
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                lookups = stats.cache_hits + stats.cache_misses
+                result[name] = {
+                    'executions': stats.executions,
+                    'cache_hits': stats.cache_hits,
+                    'cache_misses': stats.cache_misses,
+                    'cache_hit_ratio': stats.cache_hits / lookups if lookups else 0.0,
+                    'prepares': stats.prepares,
+                    'prepared_executions': stats.prepared_executions,
+                }
+            return result
+
+
+registry = QueryRegistry()
+
+registry.register('pet_by_id', lambda: select(Pets).where(Pets.id == bindparam('pet_id')))
+registry.register('owner_with_pets', lambda: select(Owners).where(Owners.owner_id == bindparam('owner_id')))
+registry.register(
+    'pets_of_owner',
+    lambda: select(Pets).where(Pets.owner_id == bindparam('owner_id')).order_by(Pets.id),
+)
+registry.register(
+    'pet_history',
+    lambda: (
+        select(ManipulationFacts)
+        .where(
+            ManipulationFacts.pet_id == bindparam('pet_id'),
+            ManipulationFacts.begin_time >= bindparam('since'),
+            ManipulationFacts.begin_time < bindparam('until'),
+        )
+        .order_by(ManipulationFacts.begin_time)
+    ),
+)
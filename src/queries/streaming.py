@@ -0,0 +1,44 @@
+from typing import Any, Iterator
+
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+
+
+def selects_single_entity(stmt: Select) -> bool:
+    """ Запрос вида select(Model) - результат удобнее получать через scalars() """
+
+    descriptions = stmt.column_descriptions
+    return len(descriptions) == 1 and descriptions[0]['expr'] is descriptions[0]['entity']
+
+
+def stream_partitions(session: Session, stmt: Select, size: int = 1000, expunge: bool = False) -> Iterator[list[Any]]:
+    """
+    Выполняет запрос через серверный курсор (именованный курсор psycopg2)
+    и отдаёт результат партициями по size строк.
+
+    Для select(Model) партиции состоят из объектов, иначе - из строк Row.
+    При expunge=True объекты партиции отсоединяются от сессии после её обработки,
+    так что в памяти одновременно находится не больше одной партиции.
+    """
+
+    result = session.execute(stmt, execution_options={'yield_per': size})
+    single_entity = selects_single_entity(stmt)
+    if single_entity:
+        result = result.scalars()
+
+    try:
+        for partition in result.partitions():
+            yield partition
+            if expunge and single_entity:
+                for obj in partition:
+                    if obj in session:
+                        session.expunge(obj)
+    finally:
+        result.close()
+
+
+def stream(session: Session, stmt: Select, size: int = 1000, expunge: bool = False) -> Iterator[Any]:
+    """ То же, что stream_partitions(), но по одной строке или объекту """
+
+    for partition in stream_partitions(session, stmt, size, expunge):
+        yield from partition
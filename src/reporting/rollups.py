@@ -0,0 +1,203 @@
+from datetime import date, datetime, time
+
+from sqlalchemy import (
+    Column, Date, Float, Integer, MetaData, PrimaryKeyConstraint, Select, String, Table, case, cast, func, select,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Dialect, Engine
+
+from src.config.engine import get_engine
+from src.models import ManipulationFacts, Pets
+
+
+# Отчётные агрегаты живут вне Base.metadata: на PostgreSQL manipulation_daily_stats -
+# материализованное представление, на SQLite - сводная таблица. Создаются миграцией
+# (или create_rollups() для баз, созданных через create_all).
+metadata = MetaData()
+
+# Процедуры за день в разрезе вида питомца и типа манипуляции; species_id = 0 - вид не указан
+daily_stats = Table(
+    'manipulation_daily_stats',
+    metadata,
+    Column('day', Date, nullable=False),
+    Column('species_id', Integer, nullable=False),
+    Column('manipulation_id', Integer, nullable=False),
+    Column('facts', Integer, nullable=False),
+    Column('planned', Integer, nullable=False),
+    Column('finished', Integer, nullable=False),
+    Column('duration_seconds', Float, nullable=False),
+    PrimaryKeyConstraint('day', 'species_id', 'manipulation_id'),
+)
+
+# До какой даты (не включая) агрегаты посчитаны; всё, что позже, читается из manipulation_facts
+watermarks = Table(
+    'report_watermarks',
+    metadata,
+    Column('name', String, primary_key=True),
+    Column('through', Date, nullable=False),
+)
+
+GROUPINGS = ('day', 'species', 'manipulation')
+_GROUP_COLUMNS = {'day': 'day', 'species': 'species_id', 'manipulation': 'manipulation_id'}
+_METRICS = ('facts', 'planned', 'finished', 'duration_seconds')
+
+
+def rollup_select(dialect: Dialect, since: date | None = None, until: date | None = None) -> Select:
+    """ Агрегация manipulation_facts по дням, видам и манипуляциям за [since, until) """
+
+    begin, end = ManipulationFacts.begin_time, ManipulationFacts.end_time
+    if dialect.name == 'postgresql':
+        day = cast(begin, Date)
+        # EXTRACT на PostgreSQL 14+ возвращает numeric (Decimal), а агрегаты хранят float
+        duration = cast(func.extract('epoch', end - begin), Float)
+    else:
+        day = func.date(begin)
+        duration = (func.julianday(end) - func.julianday(begin)) * 86400
+
+    stmt = (
+        select(
+            day.label('day'),
+            func.coalesce(Pets.species, 0).label('species_id'),
+            ManipulationFacts.manipulation_id.label('manipulation_id'),
+            func.count().label('facts'),
+            func.sum(case((ManipulationFacts.is_planned, 1), else_=0)).label('planned'),
+            func.count(end).label('finished'),
+            func.coalesce(func.sum(duration), 0).label('duration_seconds'),
+        )
+        .select_from(ManipulationFacts)
+        .outerjoin(Pets, ManipulationFacts.pet_id == Pets.id)
+        .group_by(day, func.coalesce(Pets.species, 0), ManipulationFacts.manipulation_id)
+    )
+    if since is not None:
+        stmt = stmt.where(begin >= datetime.combine(since, time()))
+    if until is not None:
+        stmt = stmt.where(begin < datetime.combine(until, time()))
+    return stmt
+
+
+def materialized_view_sql(dialect: Dialect) -> str:
+    """ Определение материализованного представления: только закрытые (прошедшие) дни """
+
+    stmt = rollup_select(dialect).where(ManipulationFacts.begin_time < func.current_date())
+    return str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+
+def create_rollups(engine: Engine) -> None:
+    """ Создаёт отчётные агрегаты в базе, схема которой построена без миграций """
+
+    with engine.begin() as connection:
+        if engine.dialect.name == 'postgresql':
+            watermarks.create(connection, checkfirst=True)
+            connection.exec_driver_sql(
+                f'CREATE MATERIALIZED VIEW IF NOT EXISTS {daily_stats.name} AS {materialized_view_sql(engine.dialect)}'
+            )
+            connection.exec_driver_sql(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS ux_{daily_stats.name} '
+                f'ON {daily_stats.name} (day, species_id, manipulation_id)'
+            )
+        else:
+            metadata.create_all(connection)
+
+
+def _upsert_watermark(connection, through: date):
+    insert = pg_insert if connection.dialect.name == 'postgresql' else sqlite_insert
+    stmt = insert(watermarks).values(name=daily_stats.name, through=through)
+    connection.execute(stmt.on_conflict_do_update(index_elements=['name'], set_={'through': through}))
+
+
+def refresh(key: str = 'postgresql', *, engine: Engine | None = None, today: date | None = None) -> date:
+    """
+    Досчитывает агрегаты по всем закрытым дням (до today) и возвращает новую границу.
+
+    PostgreSQL: REFRESH MATERIALIZED VIEW CONCURRENTLY - чтение отчётов не блокируется.
+    SQLite: пересчитываются только дни после предыдущей границы. Изменения задним числом
+    подхватит rebuild().
+    """
+
+    engine = engine or get_engine(key)
+    with engine.begin() as connection:
+        if engine.dialect.name == 'postgresql':
+            connection.exec_driver_sql(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {daily_stats.name}')
+            through = connection.scalar(select(func.current_date()))
+        else:
+            through = today or date.today()
+            since = connection.scalar(select(watermarks.c.through).where(watermarks.c.name == daily_stats.name))
+            if since is None or since < through:
+                _recompute(connection, since, through)
+        _upsert_watermark(connection, through)
+    return through
+
+
+def rebuild(key: str = 'postgresql', *, engine: Engine | None = None, since: date | None = None,
+            today: date | None = None) -> date:
+    """ Полный (или начиная с since) пересчёт агрегатов - после исправления старых данных """
+
+    engine = engine or get_engine(key)
+    if engine.dialect.name == 'postgresql':
+        return refresh(engine=engine)
+
+    through = today or date.today()
+    with engine.begin() as connection:
+        _recompute(connection, since, through)
+        _upsert_watermark(connection, through)
+    return through
+
+
+def _recompute(connection, since: date | None, until: date) -> None:
+    delete = daily_stats.delete().where(daily_stats.c.day < until)
+    if since is not None:
+        delete = delete.where(daily_stats.c.day >= since)
+    connection.execute(delete)
+    connection.execute(
+        daily_stats.insert().from_select(
+            [column.name for column in daily_stats.columns], rollup_select(connection.dialect, since, until)
+        )
+    )
+
+
+def procedure_stats(session, group_by: str, start: date, end: date) -> dict:
+    """
+    Статистика процедур за [start, end), сгруппированная по 'day', 'species' или 'manipulation':
+    {ключ: {'facts', 'planned', 'finished', 'duration_seconds', 'avg_duration_seconds'}}.
+
+    Закрытые дни берутся из агрегатов, открытый интервал после последнего refresh()
+    досчитывается запросом к manipulation_facts.
+    """
+
+    if group_by not in GROUPINGS:
+        raise ValueError(f'Неизвестная группировка: {group_by!r}, доступны: {", ".join(GROUPINGS)}')
+    column = _GROUP_COLUMNS[group_by]
+
+    through = session.execute(
+        select(watermarks.c.through).where(watermarks.c.name == daily_stats.name)
+    ).scalar()
+    split = start if through is None else min(max(through, start), end)
+
+    results: dict = {}
+
+    def merge(stmt):
+        for row in session.execute(stmt):
+            key = row[0]
+            if isinstance(key, str):
+                key = date.fromisoformat(key)
+            totals = results.setdefault(key, dict.fromkeys(_METRICS, 0))
+            for name in _METRICS:
+                totals[name] += row._mapping[name] or 0
+
+    def grouped(source):
+        # sum() по bigint на PostgreSQL - numeric: приводим к типам столбцов агрегатов,
+        # чтобы обе части отчёта складывались (int и float, а не Decimal)
+        return select(
+            source.c[column],
+            *(cast(func.sum(source.c[name]), daily_stats.c[name].type).label(name) for name in _METRICS),
+        ).group_by(source.c[column])
+
+    if split > start:
+        merge(grouped(daily_stats).where(daily_stats.c.day >= start, daily_stats.c.day < split))
+    if split < end:
+        merge(grouped(rollup_select(session.get_bind().dialect, split, end).subquery()))
+
+    for totals in results.values():
+        totals['avg_duration_seconds'] = totals['duration_seconds'] / totals['finished'] if totals['finished'] else None
+    return dict(sorted(results.items()))
@@ -0,0 +1,205 @@
+"""
+Общие фикстуры для тестов, работающих с БД.
+
+Схема создаётся один раз на сессию pytest миграциями Alembic до head, каждый тест
+выполняется внутри внешней транзакции, которая откатывается после теста.
+session.commit() в коде под тестом фиксирует только SAVEPOINT, поэтому тесты
+не видят данных друг друга. Код, который сам открывает транзакции движка
+(engine.begin() в src/bulk, src/reporting), тестируется с committed_engine:
+данные фиксируются по-настоящему, а после теста таблицы очищаются.
+
+По умолчанию используется SQLite в памяти (одно соединение через StaticPool).
+Для PostgreSQL задайте TEST_DATABASE_URL: тестовая база будет создана копированием
+шаблонной базы <имя>_template, мигрированной до head.
+
+Тесты можно запускать параллельно (pytest -n auto, pytest-xdist): каждый воркер
+получает свою базу - <имя>_gw0, <имя>_gw1, ... для PostgreSQL и файла SQLite,
+отдельный процесс - для SQLite в памяти.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from src.config.engine import build_engine
+from src.models import Base
+from src.reporting.rollups import daily_stats, metadata as reporting_metadata, watermarks
+
+
+ROOT = Path(__file__).resolve().parent.parent
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL', 'sqlite:///:memory:')
+WORKER = os.environ.get('PYTEST_XDIST_WORKER')
+
+
+def alembic_config(url: str | None = None, connection: Connection | None = None) -> Config:
+    """ Конфигурация Alembic без alembic.ini, чтобы не перенастраивать логирование pytest """
+
+    config = Config()
+    config.set_main_option('script_location', str(ROOT / 'alembic'))
+    if url is not None:
+        config.set_main_option('sqlalchemy.url', url.replace('%', '%%'))
+    if connection is not None:
+        config.attributes['connection'] = connection
+    return config
+
+
+def migrations_fingerprint() -> str:
+    """ Хэш файлов миграций: по нему видно, что шаблонную базу пора пересоздать """
+
+    digest = hashlib.sha1()
+    for path in sorted((ROOT / 'alembic' / 'versions').glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def worker_database_url(url: str) -> str:
+    """ URL отдельной базы для воркера xdist; без xdist и для SQLite в памяти - исходный """
+
+    url = make_url(url)
+    if WORKER is None or url.database in (None, '', ':memory:'):
+        return url.render_as_string(hide_password=False)
+    if url.get_backend_name() == 'sqlite':
+        path = Path(url.database)
+        database = str(path.with_name(f'{path.stem}_{WORKER}{path.suffix}'))
+    else:
+        database = f'{url.database}_{WORKER}'
+    return url.set(database=database).render_as_string(hide_password=False)
+
+
+def _enable_sqlite_savepoints(engine: Engine) -> None:
+    # pysqlite сам управляет BEGIN и ломает SAVEPOINT; отдаём транзакции SQLAlchemy
+    @event.listens_for(engine, 'connect')
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def do_begin(conn):
+        conn.exec_driver_sql('BEGIN')
+
+
+def create_database_from_template(url: str) -> None:
+    """
+    Пересоздаёт базу из url копией шаблона <имя>_template (CREATE DATABASE ... TEMPLATE).
+    Шаблон мигрируется до head и строится заново только при изменении миграций.
+    Воркеры xdist работают с шаблоном по очереди под advisory lock.
+    """
+
+    url = make_url(url)
+    database = url.database
+    template = f'{make_url(TEST_DATABASE_URL).database}_template'
+    admin = create_engine(url.set(database='postgres'), isolation_level='AUTOCOMMIT', poolclass=NullPool)
+    try:
+        with admin.connect() as conn:
+            conn.execute(text('SELECT pg_advisory_lock(hashtext(:name))'), {'name': template})
+            try:
+                fingerprint = migrations_fingerprint()
+                current = conn.scalar(
+                    text('SELECT shobj_description(oid, \'pg_database\') FROM pg_database WHERE datname = :name'),
+                    {'name': template},
+                )
+                if current != fingerprint:
+                    conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{template}" WITH (FORCE)')
+                    conn.exec_driver_sql(f'CREATE DATABASE "{template}"')
+                    template_url = url.set(database=template).render_as_string(hide_password=False)
+                    command.upgrade(alembic_config(url=template_url), 'head')
+                    conn.exec_driver_sql(f'COMMENT ON DATABASE "{template}" IS \'{fingerprint}\'')
+
+                conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)')
+                conn.exec_driver_sql(f'CREATE DATABASE "{database}" TEMPLATE "{template}"')
+            finally:
+                conn.execute(text('SELECT pg_advisory_unlock(hashtext(:name))'), {'name': template})
+    finally:
+        admin.dispose()
+
+
+@pytest.fixture(scope='session')
+def db_engine():
+    """ Движок тестовой БД воркера со схемой, созданной один раз на сессию pytest """
+
+    url = worker_database_url(TEST_DATABASE_URL)
+    parsed = make_url(url)
+    sqlite_file = None
+
+    if parsed.get_backend_name() == 'postgresql':
+        create_database_from_template(url)
+        engine = build_engine(url, pool_size=2, max_overflow=0)
+    else:
+        if parsed.database not in (None, '', ':memory:'):
+            sqlite_file = Path(parsed.database)
+            sqlite_file.unlink(missing_ok=True)
+        engine = build_engine(url)
+        _enable_sqlite_savepoints(engine)
+        with engine.begin() as connection:
+            command.upgrade(alembic_config(connection=connection), 'head')
+
+    yield engine
+    engine.dispose()
+    if sqlite_file is not None:
+        sqlite_file.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def db_connection(db_engine):
+    """ Соединение с открытой внешней транзакцией, которая откатывается после теста """
+
+    with db_engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            yield connection
+        finally:
+            transaction.rollback()
+
+
+@pytest.fixture
+def db_session(db_connection):
+    """
+    Сессия поверх внешней транзакции теста: commit() и rollback() в тестируемом коде
+    работают с SAVEPOINT, а всё, что тест записал, откатывается после него
+    """
+
+    session = Session(bind=db_connection, join_transaction_mode='create_savepoint')
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def committed_engine(db_engine):
+    """
+    Движок тестовой БД без внешней транзакции: для кода, который сам вызывает engine.begin().
+    После теста удаляются строки таблиц моделей и таблицы, созданные тестом (архивы purge),
+    отчётные агрегаты и границы refresh() возвращаются к состоянию после миграций
+    """
+
+    with db_engine.connect() as connection:
+        saved_watermarks = [dict(row._mapping) for row in connection.execute(watermarks.select())]
+
+    yield db_engine
+
+    known = {table.name for table in (*Base.metadata.sorted_tables, *reporting_metadata.sorted_tables)}
+    with db_engine.begin() as connection:
+        if db_engine.dialect.name == 'postgresql':
+            # get_table_names() на PostgreSQL перечисляет и секции manipulation_facts
+            known.update(connection.exec_driver_sql('SELECT inhrelid::regclass::text FROM pg_inherits').scalars())
+        for name in inspect(connection).get_table_names():
+            if name not in known and name != 'alembic_version':
+                connection.exec_driver_sql(f'DROP TABLE {name}')
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+        if db_engine.dialect.name == 'postgresql':
+            connection.exec_driver_sql(f'REFRESH MATERIALIZED VIEW {daily_stats.name}')
+        else:
+            connection.execute(daily_stats.delete())
+        connection.execute(watermarks.delete())
+        if saved_watermarks:
+            connection.execute(watermarks.insert(), saved_watermarks)
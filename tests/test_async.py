@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from src.config.async_engine import async_url, dispose_async_engines, get_async_engine
+from src.config.async_session import async_session_scope
+from src.config.engine import build_engine
+from src.config.url import DB_URL
+from src.models import Base, ManipulationFacts, Manipulations, Owners, Pets
+from src.queries.async_common import (
+    gather_queries,
+    get_owner_with_pets,
+    get_pet,
+    get_pet_history,
+    get_pets_of_owner,
+)
+
+
+KEY = 'async_test'
+
+
+@pytest.fixture
+def async_db(tmp_path, monkeypatch):
+    """
+    Файл SQLite под ключом KEY в DB_URL: схема и данные создаются синхронным движком,
+    тест работает с ними через aiosqlite. Файл, а не :memory: - у каждого соединения
+    aiosqlite своя база в памяти
+    """
+
+    url = f'sqlite:///{tmp_path / "async.db"}'
+    engine = build_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Manipulations.__table__.insert(), [{'manipulation_id': 1, 'manipulation_name': 'Осмотр'}])
+        connection.execute(Owners.__table__.insert(), [{'owner_id': i, 'owner_name': f'owner{i}'} for i in (1, 2)])
+        connection.execute(Pets.__table__.insert(), [
+            {'id': i, 'name': f'pet{i}', 'owner_id': 1 if i < 4 else 2} for i in range(1, 6)
+        ])
+        connection.execute(ManipulationFacts.__table__.insert(), [
+            {'pet_id': 1, 'manipulation_id': 1, 'begin_time': datetime(2025, 6, day)} for day in (3, 1, 2)
+        ])
+    engine.dispose()
+
+    monkeypatch.setitem(DB_URL, KEY, url)
+    yield
+    asyncio.run(dispose_async_engines())
+
+
+def test_async_url():
+    assert async_url('postgresql+psycopg2://u:p@db:5432/clinic') == 'postgresql+asyncpg://u:p@db:5432/clinic'
+    assert async_url('sqlite:///:memory:') == 'sqlite+aiosqlite:///:memory:'
+    with pytest.raises(ValueError):
+        async_url('mysql://db/clinic')
+
+
+def test_common_queries(async_db):
+    async def run():
+        async with async_session_scope(KEY) as session:
+            owner = await get_owner_with_pets(session, 1)
+            # Питомцы загружены вместе с владельцем: обращение к коллекции не требует await
+            names = [pet.name for pet in owner.pets]
+            pets = await get_pets_of_owner(session, 2)
+            history = await get_pet_history(session, 1, since=datetime(2025, 6, 2))
+            pet = await get_pet(session, 1)
+            return names, pets, history, pet, owner.pets[0]
+
+    names, pets, history, pet, first = asyncio.run(run())
+
+    assert sorted(names) == ['pet1', 'pet2', 'pet3']
+    assert [pet.id for pet in pets] == [4, 5]
+    assert [fact.begin_time.day for fact in history] == [2, 3]
+    assert pet is first
+
+
+def test_gather_queries_runs_in_separate_sessions(async_db):
+    pets = asyncio.run(gather_queries(get_pet, [(i,) for i in (5, 1, 3, 42)], key=KEY))
+
+    assert [pet and pet.name for pet in pets] == ['pet5', 'pet1', 'pet3', None]
+
+
+def test_session_scope_commits_or_rolls_back(async_db):
+    async def add(name: str, fail: bool):
+        async with async_session_scope(KEY) as session:
+            session.add(Pets(name=name))
+            await session.flush()
+            if fail:
+                raise RuntimeError('boom')
+
+    async def names():
+        async with async_session_scope(KEY) as session:
+            return set((await session.scalars(select(Pets.name).where(Pets.name.like('new%')))).all())
+
+    asyncio.run(add('new1', fail=False))
+    with pytest.raises(RuntimeError):
+        asyncio.run(add('new2', fail=True))
+
+    assert asyncio.run(names()) == {'new1'}
+
+
+def test_engine_is_shared(async_db):
+    async def count():
+        async with get_async_engine(KEY).connect() as connection:
+            return await connection.scalar(select(func.count()).select_from(Pets))
+
+    assert get_async_engine(KEY) is get_async_engine(KEY)
+    assert get_async_engine(KEY).dialect.driver == 'aiosqlite'
+    assert asyncio.run(count()) == 5
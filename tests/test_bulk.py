@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import MetaData, Table, insert, select
+from sqlalchemy.dialects import postgresql
+
+import src.bulk.upsert as upsert
+from src.bulk.purge import purge
+from src.bulk.upsert import bulk_update, bulk_upsert
+from src.models import ManipulationFacts, Owners, Pets
+
+
+def owners(engine) -> dict:
+    with engine.connect() as connection:
+        return dict(connection.execute(select(Owners.owner_id, Owners.owner_name)).all())
+
+
+def test_bulk_update_counts_updated_rows(committed_engine):
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Owners), [{'owner_id': i, 'owner_name': f'o{i}'} for i in range(1, 6)])
+
+    report = bulk_update(Owners, [
+        {'owner_id': 1, 'owner_name': 'a'},
+        {'owner_id': 2, 'owner_name': 'b', 'owner_phone': '+7'},
+        {'owner_id': 3, 'owner_name': 'c'},
+        {'owner_id': 99, 'owner_name': 'нет такой строки'},
+        {'owner_id': 4},
+    ], batch_size=2, engine=committed_engine)
+
+    # Строка без ключа в базе не считается, строка из одного ключа не обновляется
+    assert report.rows == 3
+    assert owners(committed_engine) == {1: 'a', 2: 'b', 3: 'c', 4: 'o4', 5: 'o5'}
+    with committed_engine.connect() as connection:
+        assert connection.scalar(select(Owners.owner_phone).where(Owners.owner_id == 2)) == '+7'
+
+
+def test_bulk_upsert_counts_inserted_and_updated_rows(committed_engine):
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Owners), [{'owner_id': 1, 'owner_name': 'old', 'owner_phone': '+7'}])
+
+    report = bulk_upsert(Owners, [
+        {'owner_id': 1, 'owner_name': 'new'},
+        {'owner_id': 2, 'owner_name': 'two'},
+        {'owner_id': 3, 'owner_name': 'three'},
+    ], batch_size=2, engine=committed_engine)
+
+    assert report.rows == 3
+    assert report.batches == 2
+    assert owners(committed_engine) == {1: 'new', 2: 'two', 3: 'three'}
+    # Непереданные столбцы при конфликте не затираются
+    with committed_engine.connect() as connection:
+        assert connection.scalar(select(Owners.owner_phone).where(Owners.owner_id == 1)) == '+7'
+
+
+def test_bulk_upsert_update_columns(committed_engine):
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Owners), [{'owner_id': 1, 'owner_name': 'old', 'owner_phone': '+7'}])
+
+    bulk_upsert(Owners, [{'owner_id': 1, 'owner_name': 'new', 'owner_phone': '+8'}],
+                update_columns=['owner_phone'], engine=committed_engine)
+
+    with committed_engine.connect() as connection:
+        assert connection.execute(select(Owners.owner_name, Owners.owner_phone)).one() == ('old', '+8')
+
+
+def test_purge_with_archive(committed_engine):
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Pets), [{'id': i, 'name': f'pet{i}', 'weight': float(i)} for i in range(1, 11)])
+    progress = []
+
+    report = purge(Pets, Pets.weight > 3, batch_size=3, archive='pets_archive',
+                   progress=lambda report: progress.append(report.rows), engine=committed_engine)
+
+    assert (report.rows, report.archived, report.batches) == (7, 7, 3)
+    assert progress == [3, 6, 7]
+    with committed_engine.connect() as connection:
+        assert connection.scalars(select(Pets.id).order_by(Pets.id)).all() == [1, 2, 3]
+        archive = Table('pets_archive', MetaData(), autoload_with=connection)
+        archived = connection.execute(select(archive.c.id, archive.c.name).order_by(archive.c.id)).all()
+    assert archived == [(i, f'pet{i}') for i in range(4, 11)]
+
+
+def test_purge_limit(committed_engine):
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Pets), [{'id': i, 'name': f'pet{i}'} for i in range(1, 11)])
+
+    report = purge(Pets, batch_size=3, limit=5, engine=committed_engine)
+
+    assert (report.rows, report.batches, report.archived) == (5, 2, 0)
+    with committed_engine.connect() as connection:
+        assert connection.scalars(select(Pets.id).order_by(Pets.id)).all() == [6, 7, 8, 9, 10]
+
+
+class RecordingEngine:
+    """ Движок PostgreSQL, который запоминает запросы вместо выполнения """
+
+    def __init__(self):
+        self.dialect = postgresql.psycopg2.dialect()
+        self.statements = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=self.dialect)))
+        return SimpleNamespace(rowcount=1)
+
+
+def test_bulk_upsert_uses_primary_key_from_database(monkeypatch):
+    # Секционированная manipulation_facts на PostgreSQL: первичный ключ (id, begin_time)
+    primary_key = {'constrained_columns': ['id', 'begin_time']}
+    monkeypatch.setattr(upsert, 'inspect', lambda connection: SimpleNamespace(
+        get_pk_constraint=lambda name, schema=None: primary_key,
+    ))
+    engine = RecordingEngine()
+
+    bulk_upsert(ManipulationFacts, [
+        {'id': 1, 'pet_id': 1, 'manipulation_id': 1, 'begin_time': datetime(2025, 6, 1), 'result': 'ok'},
+    ], engine=engine)
+
+    assert 'ON CONFLICT (id, begin_time) DO UPDATE SET' in engine.statements[0]
@@ -0,0 +1,250 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+import src.bulk.ingest as ingest
+import src.cache.reference as reference
+from src.bulk.ingest import bulk_insert
+from src.cache.lru import MISSING, LRUCache
+from src.cache.reference import species_cache
+from src.cache.results import ResultCache
+from src.cache.second_level import CachingSession, entity_cache
+from src.models import Owners, Pets, Species
+
+
+@pytest.fixture
+def statements(db_engine):
+    """ SQL, выполненные движком за время теста """
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db_engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db_engine, 'before_cursor_execute', record)
+
+
+def selects(statements: list[str]) -> list[str]:
+    return [sql for sql in statements if sql.startswith('SELECT')]
+
+
+OWNER_NAMES = select(Owners.owner_name).where(Owners.owner_id <= 2).order_by(Owners.owner_id)
+
+
+@pytest.fixture
+def result_cache(committed_engine):
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Owners), [{'owner_id': i, 'owner_name': f'o{i}'} for i in (1, 2, 3)])
+    return ResultCache(ttl=None).attach(committed_engine)
+
+
+def fetch_names(cache: ResultCache, engine) -> list[str]:
+    with engine.connect() as connection:
+        return [row.owner_name for row in cache.fetch(connection, OWNER_NAMES)]
+
+
+def test_result_cache_hit(committed_engine, result_cache, statements):
+    assert fetch_names(result_cache, committed_engine) == ['o1', 'o2']
+    assert fetch_names(result_cache, committed_engine) == ['o1', 'o2']
+
+    assert len(selects(statements)) == 1
+    assert result_cache.stats()['hits'] == 1
+
+
+def test_result_cache_parameters_are_part_of_key(committed_engine, result_cache):
+    with committed_engine.connect() as connection:
+        one = result_cache.fetch(connection, select(Owners.owner_name).where(Owners.owner_id == 1))
+        three = result_cache.fetch(connection, select(Owners.owner_name).where(Owners.owner_id == 3))
+
+    assert (one, three) == ([('o1',)], [('o3',)])
+
+
+@pytest.mark.parametrize('write', [
+    lambda connection: connection.execute(update(Owners).where(Owners.owner_id == 1).values(owner_name='new')),
+    lambda connection: connection.exec_driver_sql("UPDATE owners SET owner_name = 'new' WHERE owner_id = 1"),
+])
+def test_result_cache_invalidated_by_write(committed_engine, result_cache, write):
+    fetch_names(result_cache, committed_engine)
+    with committed_engine.begin() as connection:
+        write(connection)
+
+    assert fetch_names(result_cache, committed_engine) == ['new', 'o2']
+
+
+def test_result_cache_write_to_other_table_keeps_entry(committed_engine, result_cache, statements):
+    fetch_names(result_cache, committed_engine)
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Pets), [{'name': 'Барсик'}])
+    statements.clear()
+
+    fetch_names(result_cache, committed_engine)
+
+    assert selects(statements) == []
+
+
+def test_result_cache_bypassed_for_own_uncommitted_writes(committed_engine, result_cache):
+    fetch_names(result_cache, committed_engine)
+
+    with committed_engine.connect() as connection:
+        connection.execute(insert(Owners), [{'owner_id': 0, 'owner_name': 'o0'}])
+        assert [row.owner_name for row in result_cache.fetch(connection, OWNER_NAMES)] == ['o0', 'o1', 'o2']
+        connection.rollback()
+
+    assert fetch_names(result_cache, committed_engine) == ['o1', 'o2']
+
+
+@pytest.fixture
+def caching_session(db_connection):
+    db_connection.execute(insert(Pets), [{'id': 1, 'name': 'Барсик'}, {'id': 2, 'name': 'Мурка'}])
+    entity_cache.invalidate()
+
+    def make():
+        return CachingSession(bind=db_connection, join_transaction_mode='create_savepoint',
+                              expire_on_commit=False, second_level_cache=entity_cache)
+
+    yield make
+    entity_cache.invalidate()
+
+
+def test_second_level_cache_hit(caching_session, statements):
+    with caching_session() as session:
+        session.scalars(select(Pets)).all()
+    statements.clear()
+
+    with caching_session() as session:
+        pet = session.get(Pets, 1)
+
+    assert pet.name == 'Барсик'
+    assert selects(statements) == []
+
+
+def test_second_level_cache_invalidated_by_flush(caching_session, statements):
+    with caching_session() as session:
+        session.get(Pets, 1).name = 'Пушок'
+        session.commit()
+    statements.clear()
+
+    with caching_session() as session:
+        assert session.get(Pets, 1).name == 'Пушок'
+    assert len(selects(statements)) == 1
+
+    with caching_session() as session:
+        session.delete(session.get(Pets, 1))
+        session.commit()
+    with caching_session() as session:
+        assert session.get(Pets, 1) is None
+
+
+def test_second_level_cache_invalidated_by_orm_update(caching_session):
+    with caching_session() as session:
+        session.scalars(select(Pets)).all()
+        session.execute(update(Pets).values(weight=1.5))
+        session.commit()
+
+    with caching_session() as session:
+        assert [session.get(Pets, i).weight for i in (1, 2)] == [1.5, 1.5]
+
+
+def test_second_level_cache_keeps_uncommitted_rows_out(caching_session, statements):
+    with caching_session() as session:
+        session.get(Pets, 1).name = 'uncommitted'
+        session.add(Pets(id=3, name='Новый'))
+        session.flush()
+        # Повторная загрузка после flush видит незафиксированные значения
+        session.scalars(select(Pets).execution_options(populate_existing=True)).all()
+        session.execute(update(Pets).where(Pets.id == 2).values(weight=9.0))
+        session.scalars(select(Pets).execution_options(populate_existing=True)).all()
+        session.rollback()
+    statements.clear()
+
+    with caching_session() as session:
+        assert session.get(Pets, 1).name == 'Барсик'
+        assert session.get(Pets, 2).weight is None
+        assert session.get(Pets, 3) is None
+    assert len(selects(statements)) == 3
+
+
+def test_result_cache_invalidated_by_copy(committed_engine, result_cache, monkeypatch):
+    def copy_batch(connection, table, columns, batch, defaults=None):
+        # Как COPY на PostgreSQL: запись через DBAPI-курсор, мимо событий SQLAlchemy
+        placeholders = ', '.join('?' for _ in columns)
+        connection.connection.dbapi_connection.cursor().executemany(
+            f'INSERT INTO {table.name} ({", ".join(columns)}) VALUES ({placeholders})',
+            [tuple(row[name] for name in columns) for row in batch],
+        )
+
+    monkeypatch.setattr(ingest, '_copy_batch', copy_batch)
+    fetch_names(result_cache, committed_engine)
+
+    bulk_insert(Owners, [{'owner_id': 0, 'owner_name': 'o0'}], use_copy=True, engine=committed_engine)
+
+    assert fetch_names(result_cache, committed_engine) == ['o0', 'o1', 'o2']
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('b') is MISSING
+    assert [key for key, _ in cache.items()] == ['a', 'c']
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 1, 'hit_ratio': 0.5}
+
+
+def test_lru_ttl():
+    cache = LRUCache(ttl=0)
+    cache.set('expired', 1)
+    cache.set('kept', 2, ttl=None)
+
+    assert cache.get('expired', None) is None
+    assert cache.get('kept') == 2
+    assert cache.pop('kept') == 2
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def species(db_session, monkeypatch):
+    """ species_cache читает справочник через сессию теста """
+
+    @contextmanager
+    def session_scope(key):
+        yield Session(bind=db_session.connection())
+
+    monkeypatch.setattr(reference, 'session_scope', session_scope)
+    db_session.add_all([Species(species_id=1, species_name='Кошка'), Species(species_id=2, species_name='Собака')])
+    db_session.flush()
+    species_cache.invalidate()
+    yield species_cache
+    species_cache.invalidate()
+
+
+def test_reference_cache_reads_through(species, statements):
+    assert species.name(1) == 'Кошка'
+    # Строка, загруженная по id, заполнила и обратный индекс
+    assert species.id('Кошка') == 1
+    assert species.name(1) == 'Кошка'
+    assert species.name(42) is None
+    assert len(selects(statements)) == 2
+
+    statements.clear()
+    species.invalidate()
+    species.preload()
+    assert (species.id('Собака'), species.name(2)) == (2, 'Собака')
+    assert len(selects(statements)) == 1
+
+
+def test_reference_cache_invalidated_by_orm_change(species, db_session):
+    assert species.id('Кошка') == 1
+
+    db_session.get(Species, 1).species_name = 'Кот'
+    db_session.flush()
+
+    assert species.id('Кошка') is None
+    assert species.name(1) == 'Кот'
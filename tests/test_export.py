@@ -0,0 +1,123 @@
+import io
+import sys
+from datetime import datetime
+
+import pyarrow as pa
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import psycopg2
+
+from src.models import ManipulationFacts, Manipulations, Owners, Pets
+from src.queries.export import _copy_batches, _cursor_batches, to_arrow
+
+
+FACTS = select(
+    ManipulationFacts.id,
+    ManipulationFacts.is_planned,
+    ManipulationFacts.begin_time,
+    ManipulationFacts.end_time,
+    ManipulationFacts.result,
+).order_by(ManipulationFacts.id)
+
+
+class FakeCopyCursor:
+    """ Курсор psycopg2: mogrify и copy_expert, который пишет готовый CSV в sink """
+
+    def __init__(self, output: bytes | Exception):
+        self.output = output
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, sql, params):
+        return sql.encode()
+
+    def copy_expert(self, sql, sink):
+        assert sql.startswith('COPY (SELECT') and sql.endswith('TO STDOUT WITH (FORMAT csv)')
+        if isinstance(self.output, Exception):
+            sink.write(b'1,t,2025-06')
+            raise self.output
+        # Пишем частями, как сервер: pyarrow читает из pipe по мере поступления
+        stream = io.BytesIO(self.output)
+        while chunk := stream.read(7):
+            sink.write(chunk)
+
+
+class FakeConnection:
+    """ Connection SQLAlchemy поверх psycopg2 - ровно то, что использует _copy_batches """
+
+    def __init__(self, output: bytes | Exception):
+        self.dialect = psycopg2.dialect()
+        self.connection = self
+        self.dbapi_connection = self
+        self.output = output
+        self.invalidated = False
+
+    def cursor(self):
+        return FakeCopyCursor(self.output)
+
+    def invalidate(self):
+        self.invalidated = True
+
+
+def test_copy_batches_parse_postgresql_csv():
+    # NULL в CSV PostgreSQL - пустое поле без кавычек, пустая строка - ""
+    output = (
+        b'1,t,2025-06-01 10:00:00,,"x, ""y"""\n'
+        b'2,f,2025-06-02 11:30:00.250000,2025-06-02 12:00:00,""\n'
+        b'3,,2025-06-03 09:00:00,,\n'
+    )
+    table = pa.Table.from_batches(list(_copy_batches(FakeConnection(output), FACTS)))
+
+    assert table.schema.field('is_planned').type == pa.bool_()
+    assert table.schema.field('begin_time').type == pa.timestamp('us')
+    assert table.to_pylist() == [
+        {'id': 1, 'is_planned': True, 'begin_time': datetime(2025, 6, 1, 10),
+         'end_time': None, 'result': 'x, "y"'},
+        {'id': 2, 'is_planned': False, 'begin_time': datetime(2025, 6, 2, 11, 30, 0, 250000),
+         'end_time': datetime(2025, 6, 2, 12), 'result': ''},
+        {'id': 3, 'is_planned': None, 'begin_time': datetime(2025, 6, 3, 9),
+         'end_time': None, 'result': None},
+    ]
+
+
+def test_copy_batches_raise_copy_error():
+    connection = FakeConnection(RuntimeError('COPY failed'))
+
+    with pytest.raises(RuntimeError, match='COPY failed'):
+        list(_copy_batches(connection, FACTS))
+    # Соединение посреди COPY непригодно для следующих запросов
+    assert connection.invalidated
+
+
+def test_cursor_batches(db_connection):
+    db_connection.execute(insert(Owners), [{'owner_id': 1, 'owner_name': 'Иванов'}])
+    db_connection.execute(insert(Pets), [{'id': 1, 'name': 'Барсик', 'owner_id': 1}])
+    db_connection.execute(insert(Manipulations), [{'manipulation_id': 1, 'manipulation_name': 'Осмотр'}])
+    db_connection.execute(insert(ManipulationFacts), [
+        {'id': i, 'pet_id': 1, 'manipulation_id': 1, 'is_planned': i % 2 == 0,
+         'begin_time': datetime(2025, 6, i), 'end_time': None if i % 3 else datetime(2025, 6, i, 1),
+         'result': None}
+        for i in range(1, 6)
+    ])
+
+    batches = list(_cursor_batches(db_connection, FACTS, batch_size=2))
+
+    assert [batch.num_rows for batch in batches] == [2, 2, 1]
+    # Столбец из одних NULL получает тип по схеме запроса во всех пачках
+    assert all(batch.schema == batches[0].schema for batch in batches)
+    table = pa.Table.from_batches(batches)
+    assert table.column('id').to_pylist() == [1, 2, 3, 4, 5]
+    assert table.column('is_planned').to_pylist() == [False, True, False, True, False]
+    assert table.column('end_time').to_pylist() == [None, None, datetime(2025, 6, 3, 1), None, None]
+    assert table.column('result').null_count == 5
+
+
+def test_missing_pyarrow_error(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+
+    with pytest.raises(ImportError, match='pip install pyarrow'):
+        to_arrow(FACTS)
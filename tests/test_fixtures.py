@@ -0,0 +1,32 @@
+from alembic.script import ScriptDirectory
+from sqlalchemy import select, text
+
+from src.models import Owners
+from tests.conftest import alembic_config
+
+
+def test_schema_is_migrated_to_head(db_connection):
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+    assert db_connection.scalar(text('SELECT version_num FROM alembic_version')) == head
+
+
+def test_session_commit_releases_savepoint_only(db_connection, db_session):
+    db_session.add(Owners(owner_id=1, owner_name='Иванов'))
+    db_session.commit()
+
+    # Внешняя транзакция теста по-прежнему открыта, запись видна только в ней
+    assert db_connection.in_transaction()
+    assert db_connection.scalar(select(Owners.owner_name)) == 'Иванов'
+
+    db_session.add(Owners(owner_id=2, owner_name='Петров'))
+    db_session.rollback()
+    assert db_connection.scalars(select(Owners.owner_id)).all() == [1]
+
+
+def test_committed_engine_has_no_outer_transaction(committed_engine):
+    with committed_engine.begin() as connection:
+        connection.execute(Owners.__table__.insert(), [{'owner_id': 1, 'owner_name': 'Иванов'}])
+
+    with committed_engine.connect() as connection:
+        assert connection.scalar(select(Owners.owner_name)) == 'Иванов'
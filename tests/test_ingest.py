@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, select
+from sqlalchemy.dialects.postgresql import psycopg2
+
+from src.bulk.ingest import bulk_insert
+from src.models import ManipulationFacts, Owners, Pets
+
+
+class FakeCopyCursor:
+    """ Курсор psycopg2, который запоминает COPY вместо отправки на сервер """
+
+    def __init__(self, copied: list):
+        self.copied = copied
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, source):
+        self.copied.append((sql, source.read()))
+
+
+class FakeEngine:
+    """ Движок PostgreSQL с psycopg2: begin() отдаёт соединение, COPY и execute() записываются """
+
+    def __init__(self):
+        self.dialect = psycopg2.dialect()
+        self.engine = self
+        self.connection = self
+        self.dbapi_connection = self
+        self.copied = []
+        self.executed = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def cursor(self):
+        return FakeCopyCursor(self.copied)
+
+    def execute(self, stmt, parameters):
+        self.executed.append((stmt, parameters))
+
+
+def test_copy_fills_python_defaults():
+    engine = FakeEngine()
+
+    bulk_insert(ManipulationFacts, [
+        {'pet_id': 1, 'manipulation_id': 2, 'begin_time': datetime(2025, 6, 1, 10)},
+        {'pet_id': 1, 'manipulation_id': 3, 'begin_time': datetime(2025, 6, 2, 10)},
+    ], engine=engine)
+
+    # is_planned не передан: COPY получает Column(default=True), как и INSERT
+    assert engine.copied == [(
+        'COPY manipulation_facts (pet_id, manipulation_id, begin_time, is_planned) FROM STDIN WITH (FORMAT csv)',
+        '1,2,2025-06-01T10:00:00,true\n1,3,2025-06-02T10:00:00,true\n',
+    )]
+
+
+def test_copy_keeps_passed_values():
+    engine = FakeEngine()
+
+    bulk_insert(Pets, [{'name': 'Мурка', 'sex': 'Female'}, {'name': '', 'sex': None}], engine=engine)
+    bulk_insert(Pets, [(1, 2, 'Барсик', 'Male', 4.5, None)], engine=engine)
+
+    assert engine.copied == [
+        ('COPY pets (name, sex) FROM STDIN WITH (FORMAT csv)', '"Мурка","Female"\n"",\n'),
+        ('COPY pets (species, owner_id, name, sex, weight, birthdate) FROM STDIN WITH (FORMAT csv)',
+         '1,2,"Барсик","Male",4.5,\n'),
+    ]
+
+
+def test_callable_default_falls_back_to_insert():
+    table = Table('events', MetaData(), Column('id', Integer, primary_key=True),
+                  Column('created', DateTime, default=datetime.now))
+    engine = FakeEngine()
+
+    bulk_insert(SimpleNamespace(__table__=table), [{'id': 1}], engine=engine)
+
+    assert engine.copied == []
+    assert engine.executed[0][1] == [{'id': 1}]
+
+
+def test_returning_ids_keep_row_order(committed_engine):
+    report = bulk_insert(Owners, [{'owner_id': i, 'owner_name': f'o{i}'} for i in (50, 7, 20)],
+                         returning=True, engine=committed_engine)
+    generated = bulk_insert(Pets, ({'name': f'pet{i}'} for i in range(5)), batch_size=2, returning=True,
+                            engine=committed_engine)
+
+    assert report.ids == [50, 7, 20]
+    assert (generated.rows, generated.batches) == (5, 3)
+    with committed_engine.connect() as connection:
+        names = dict(connection.execute(select(Pets.id, Pets.name)).all())
+        assert [names[pet_id] for pet_id in generated.ids] == [f'pet{i}' for i in range(5)]
+        assert connection.scalars(select(Pets.sex).distinct()).all() == ['Male']
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import InvalidRequestError
+
+from src.models import ManipulationFacts, Manipulations, Owners, Pets, Species
+from src.queries.loading import loader_option, with_loading
+
+
+@pytest.fixture
+def statements(db_connection):
+    """ SQL, отправленный в базу во время теста """
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db_connection, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db_connection, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def clinic(db_session):
+    db_session.add_all([Species(species_id=1, species_name='Кошка'),
+                        Manipulations(manipulation_id=1, manipulation_name='Осмотр')])
+    for i in range(1, 21):
+        owner = Owners(owner_id=i, owner_name=f'owner{i}')
+        owner.pets = [Pets(name=f'pet{i}_{j}', species=1) for j in range(3)]
+        db_session.add(owner)
+    db_session.flush()
+    for pet in db_session.scalars(select(Pets)):
+        pet.manipulation_facts = [ManipulationFacts(manipulation_id=1, begin_time=datetime(2025, 6, day))
+                                  for day in (2, 1)]
+    db_session.flush()
+    db_session.expunge_all()
+
+
+@pytest.mark.parametrize('limit', [1, 20])
+def test_owners_with_pets_in_constant_queries(db_session, clinic, statements, limit):
+    owners = db_session.scalars(select(Owners).order_by(Owners.owner_id).limit(limit)).all()
+
+    # Владельцы, питомцы всей пачки (selectin) с видом (joined) и владелец питомца из identity map
+    assert [len(owner.pets) for owner in owners] == [3] * limit
+    assert {pet.species_ref.species_name for owner in owners for pet in owner.pets} == {'Кошка'}
+    assert all(pet.owner is owner for owner in owners for pet in owner.pets)
+    assert len(statements) == 2
+
+
+def test_history_is_not_loaded_by_default(db_session, clinic, statements):
+    pets = db_session.scalars(select(Pets).where(Pets.owner_id == 1)).all()
+    assert len(statements) == 1
+
+    assert [fact.begin_time.day for fact in pets[0].manipulation_facts] == [1, 2]
+    assert len(statements) == 2
+
+
+def test_with_loading_overrides_strategy(db_session, clinic, statements):
+    stmt = with_loading(select(Pets), {Pets.manipulation_facts: 'selectin', Pets.species_ref: 'raise'})
+    pets = db_session.scalars(stmt).unique().all()
+
+    # Один запрос на питомцев и один на историю всех 60 питомцев, манипуляция - JOIN в нём же
+    assert {fact.manipulation.manipulation_name for pet in pets for fact in pet.manipulation_facts} == {'Осмотр'}
+    assert len(statements) == 2
+    with pytest.raises(InvalidRequestError):
+        pets[0].species_ref
+
+
+def test_loader_option_for_chain(db_session, clinic, statements):
+    stmt = select(Owners).options(loader_option((Owners.pets, Pets.manipulation_facts), 'selectin'))
+    owners = db_session.scalars(stmt).all()
+
+    assert sum(len(pet.manipulation_facts) for owner in owners for pet in owner.pets) == 120
+    assert len(statements) == 3
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError, match='eager'):
+        loader_option(Owners.pets, 'eager')
@@ -0,0 +1,136 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from src.monitoring.pool import AdaptivePoolSizer, PoolTelemetry, resize_pool
+from src.monitoring.queries import QueryStats, normalize_statement, redact_parameters
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "monitoring.db"}')
+    with engine.begin() as connection:
+        connection.exec_driver_sql('CREATE TABLE pets (id INTEGER PRIMARY KEY, name TEXT)')
+    yield engine
+    engine.dispose()
+
+
+def test_normalize_statement():
+    assert normalize_statement('SELECT *\n  FROM pets WHERE id IN (%(id_1)s, %(id_2)s)') == (
+        'SELECT * FROM pets WHERE id IN (?)'
+    )
+    assert normalize_statement('INSERT INTO pets (name) VALUES ($1), ($2), ($3)') == (
+        'INSERT INTO pets (name) VALUES (?)'
+    )
+    assert normalize_statement('SELECT * FROM pets WHERE id = ?') == normalize_statement(
+        'SELECT  *  FROM pets WHERE id = %s'
+    )
+
+
+def test_redact_parameters():
+    assert redact_parameters({'name': 'Барсик', 'id': 1}) == "{'name': '<str>', 'id': '<int>'}"
+    assert redact_parameters(('Барсик', None)) == "['<str>', '<NoneType>']"
+    assert redact_parameters([('a',), ('b',)], executemany=True) == '<2 parameter sets>'
+
+
+def test_counts_per_normalized_statement(engine):
+    stats = QueryStats().attach(engine)
+    with engine.begin() as connection:
+        for pet_id in (1, 2, 3):
+            connection.execute(text('INSERT INTO pets (id, name) VALUES (:id, :name)'), {'id': pet_id, 'name': 'x'})
+        connection.execute(text('UPDATE pets SET name = :name'), {'name': 'y'})
+        connection.execute(text('SELECT name FROM pets WHERE id IN (1, 2)')).all()
+
+    snapshot = stats.snapshot()
+    insert = snapshot['statements']['INSERT INTO pets (id, name) VALUES (?)']
+    assert (insert['calls'], insert['rows']) == (3, 3)
+    assert snapshot['statements']['UPDATE pets SET name = ?']['rows'] == 3
+    assert insert['p50_ms'] <= insert['p99_ms'] <= insert['max_ms']
+    assert snapshot['pool_checkout']['checkouts'] == 1
+    assert snapshot['slow_queries'] == 0
+    assert stats.top(1, by='calls')[0][0] == 'INSERT INTO pets (id, name) VALUES (?)'
+
+    stats.detach(engine)
+    stats.reset()
+    with engine.connect() as connection:
+        connection.exec_driver_sql('SELECT 1')
+    assert stats.snapshot()['statements'] == {}
+
+
+def test_slow_query_log_redacts_parameters(engine, caplog):
+    QueryStats(slow_threshold_ms=0).attach(engine)
+
+    with caplog.at_level(logging.WARNING, logger='src.monitoring.queries'), engine.connect() as connection:
+        connection.execute(text('SELECT * FROM pets WHERE name = :name'), {'name': 'secret'})
+
+    [record] = caplog.records
+    assert 'SELECT * FROM pets WHERE name = ?' in record.getMessage()
+    assert "'<str>'" in record.getMessage()
+    assert 'secret' not in record.getMessage()
+
+
+@pytest.fixture
+def pooled(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "pool.db"}', poolclass=QueuePool, pool_size=4, max_overflow=2)
+    yield engine
+    engine.dispose()
+
+
+def test_pool_telemetry(pooled):
+    telemetry = PoolTelemetry().attach(pooled)
+
+    first, second = pooled.connect(), pooled.connect()
+    busy = telemetry.snapshot()
+    first.close()
+    second.invalidate()
+    second.close()
+    idle = telemetry.snapshot()
+
+    assert (busy['size'], busy['checked_out'], busy['idle'], busy['connects'], busy['checkouts']) == (4, 2, 0, 2, 2)
+    assert sum(busy['wait_ms']['histogram'].values()) == 2
+    assert busy['connection_age_s']['max'] >= 0
+    assert (idle['checked_out'], idle['idle'], idle['checkins'], idle['invalidations']) == (0, 2, 2, 1)
+    # DBAPI-соединение инвалидированной записи закрыто, новое откроется при следующей выдаче
+    assert (idle['connections'], idle['closes']) == (1, 1)
+
+    telemetry.detach()
+    pooled.connect().close()
+    assert telemetry.snapshot()['checkouts'] == 2
+
+
+def test_resize_pool_closes_idle_connections(pooled):
+    connections = [pooled.connect() for _ in range(4)]
+    for connection in connections:
+        connection.close()
+
+    resize_pool(pooled.pool, 2)
+    assert (pooled.pool.size(), pooled.pool.checkedin()) == (2, 2)
+
+    resize_pool(pooled.pool, 6)
+    connections = [pooled.connect() for _ in range(8)]
+    assert pooled.pool.checkedout() == 8
+    for connection in connections:
+        connection.close()
+    assert pooled.pool.checkedin() == 6
+
+
+def test_adaptive_sizer_stays_within_bounds(pooled):
+    sizer = AdaptivePoolSizer(pooled, min_size=2, max_size=7, grow_wait_ms=50, shrink_wait_ms=1, step=2)
+
+    assert [sizer.adjust(100), sizer.adjust(100), sizer.adjust(10)] == [6, 7, 7]
+    # Уменьшается, только если простаивает хотя бы step соединений
+    assert sizer.adjust(0) == 7
+    for connection in [pooled.connect() for _ in range(3)]:
+        connection.close()
+    assert [sizer.adjust(0) for _ in range(4)] == [5, 3, 2, 2]
+    assert pooled.pool.checkedin() == 2
+    assert [(before, after) for _, before, after in sizer.resizes] == [(4, 6), (6, 7), (7, 5), (5, 3), (3, 2)]
+
+    sizer.detach()
+
+
+def test_adaptive_sizer_requires_queue_pool():
+    with pytest.raises(TypeError):
+        AdaptivePoolSizer(create_engine('sqlite://', poolclass=StaticPool), 1, 2)
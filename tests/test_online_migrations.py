@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy.dialects.postgresql import psycopg2
+
+import src.maintenance.online_migrations as online_migrations
+from src.maintenance.online_migrations import _create_index_concurrently, add_column
+
+
+class PgError(Exception):
+    def __init__(self, pgcode: str):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeMigration:
+    """
+    op и соединение PostgreSQL вне транзакции (autocommit_block): CREATE INDEX CONCURRENTLY
+    падает с кодами из failures и, как настоящий, оставляет после себя невалидный индекс
+    """
+
+    def __init__(self, failures: list[str], index: str | None = None):
+        self.dialect = psycopg2.dialect()
+        self.failures = failures
+        self.index = index
+        self.log = []
+
+    def get_bind(self):
+        return self
+
+    def get_context(self):
+        return SimpleNamespace(as_sql=False)
+
+    def get_execution_options(self):
+        return {'isolation_level': 'AUTOCOMMIT'}
+
+    def exec_driver_sql(self, sql):
+        return FakeResult('0')
+
+    def execute(self, clause, parameters=None):
+        sql = str(clause)
+        if 'indisvalid' in sql:
+            return FakeResult(None if self.index is None else self.index == 'invalid')
+        if 'set_config' in sql:
+            return FakeResult(None)
+        self.log.append(sql)
+        if sql.startswith('DROP INDEX'):
+            self.index = None
+
+    def create_index(self, name, table, columns, **kw):
+        self.log.append(f'CREATE INDEX CONCURRENTLY {name}')
+        if self.index is not None:
+            raise sa.exc.ProgrammingError('CREATE INDEX', {}, PgError('42P07'))
+        if self.failures:
+            self.index = 'invalid'
+            raise sa.exc.OperationalError('CREATE INDEX', {}, PgError(self.failures.pop(0)))
+        self.index = 'valid'
+
+
+@pytest.fixture
+def migration(monkeypatch):
+    def make(failures: list[str], index: str | None = None) -> FakeMigration:
+        fake = FakeMigration(failures, index)
+        monkeypatch.setattr(online_migrations, 'op', fake)
+        return fake
+    return make
+
+
+def create(attempts: int = 3) -> None:
+    _create_index_concurrently('ix_pets_name', 'pets', ['name'], attempts, delay=0)
+
+
+def test_lock_timeout_drops_invalid_index_and_retries(migration):
+    fake = migration(['55P03', '40P01'])
+
+    create()
+
+    assert fake.index == 'valid'
+    assert fake.log == [
+        'CREATE INDEX CONCURRENTLY ix_pets_name',
+        'DROP INDEX CONCURRENTLY IF EXISTS ix_pets_name',
+    ] * 2 + ['CREATE INDEX CONCURRENTLY ix_pets_name']
+
+
+def test_invalid_index_from_previous_run_is_rebuilt(migration):
+    fake = migration([], index='invalid')
+
+    create()
+
+    assert fake.log == ['DROP INDEX CONCURRENTLY IF EXISTS ix_pets_name', 'CREATE INDEX CONCURRENTLY ix_pets_name']
+
+
+def test_valid_index_is_kept(migration):
+    fake = migration([], index='valid')
+
+    with pytest.raises(sa.exc.ProgrammingError):
+        create()
+    assert fake.index == 'valid'
+
+
+@pytest.mark.parametrize('failures, builds', [(['23505'], 1), (['55P03'] * 3, 3)])
+def test_failed_build_leaves_no_invalid_index(migration, failures, builds):
+    # Нарушение уникальности не повторяется, lock_timeout - не больше attempts раз
+    fake = migration(failures)
+
+    with pytest.raises(sa.exc.OperationalError):
+        create(attempts=3)
+    assert fake.index is None
+    assert fake.log.count('CREATE INDEX CONCURRENTLY ix_pets_name') == builds
+
+
+def test_add_column_with_backfill_on_sqlite(committed_engine):
+    if committed_engine.dialect.name != 'sqlite':
+        pytest.skip('SQLite-only: on PostgreSQL the helpers need a migration-managed transaction')
+    scratch = sa.Table('scratch_weights', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True),
+                       sa.Column('weight', sa.Float))
+    with committed_engine.begin() as connection:
+        scratch.create(connection)
+        connection.execute(scratch.insert(), [{'id': i, 'weight': i / 4} for i in range(1, 6)])
+
+    with committed_engine.begin() as connection, Operations.context(MigrationContext.configure(connection)):
+        report = add_column('scratch_weights', sa.Column('weight_g', sa.Integer),
+                            backfill_values={'weight_g': 'round(weight * 1000)'}, not_null=True, batch_size=2)
+
+    assert (report.rows, report.batches) == (5, 3)
+    with committed_engine.connect() as connection:
+        table = sa.Table('scratch_weights', sa.MetaData(), autoload_with=connection)
+        assert not table.c.weight_g.nullable
+        assert connection.execute(sa.select(table.c.weight_g).order_by(table.c.id)).scalars().all() == [
+            250, 500, 750, 1000, 1250,
+        ]
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from src.models import ManipulationFacts, Manipulations, Pets
+from src.queries.pagination import decode_cursor, encode_cursor, paginate
+
+
+@pytest.fixture
+def pets(db_session):
+    db_session.add_all(Pets(id=i, name=f'pet{i}') for i in range(1, 8))
+    db_session.flush()
+
+
+def ids(page) -> list[int]:
+    return [pet.id for pet in page]
+
+
+def test_cursor_roundtrip():
+    values = [datetime(2025, 6, 1, 10, 30), 42]
+
+    assert decode_cursor(encode_cursor(values, 'prev')) == (values, 'prev')
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+
+def test_next_and_prev(db_session, pets):
+    first = paginate(db_session, select(Pets), [Pets.id], page_size=3)
+    assert ids(first) == [1, 2, 3]
+    assert first.prev_cursor is None
+
+    second = paginate(db_session, select(Pets), [Pets.id], page_size=3, cursor=first.next_cursor)
+    last = paginate(db_session, select(Pets), [Pets.id], page_size=3, cursor=second.next_cursor)
+    assert ids(second) == [4, 5, 6]
+    assert ids(last) == [7]
+    assert last.next_cursor is None
+
+    # Назад - та же страница в прямом порядке, с первой страницы назад идти некуда
+    back = paginate(db_session, select(Pets), [Pets.id], page_size=3, cursor=last.prev_cursor)
+    assert ids(back) == [4, 5, 6]
+    assert back.next_cursor is not None
+    start = paginate(db_session, select(Pets), [Pets.id], page_size=3, cursor=back.prev_cursor)
+    assert ids(start) == [1, 2, 3]
+    assert start.prev_cursor is None
+
+
+def test_descending(db_session, pets):
+    first = paginate(db_session, select(Pets), [Pets.id], page_size=4, descending=True)
+    second = paginate(db_session, select(Pets), [Pets.id], page_size=4, descending=True, cursor=first.next_cursor)
+    back = paginate(db_session, select(Pets), [Pets.id], page_size=4, descending=True, cursor=second.prev_cursor)
+
+    assert ids(first) == [7, 6, 5, 4]
+    assert ids(second) == [3, 2, 1]
+    assert ids(back) == [7, 6, 5, 4]
+
+
+def test_composite_key_with_ties(db_session, pets):
+    db_session.add(Manipulations(manipulation_id=1, manipulation_name='Осмотр'))
+    # Одинаковое begin_time у соседних строк: порядок и границу задаёт второй столбец ключа
+    db_session.add_all(
+        ManipulationFacts(id=i, pet_id=1, manipulation_id=1, begin_time=datetime(2025, 6, 1 + i // 2))
+        for i in range(1, 7)
+    )
+    db_session.flush()
+    keys = [ManipulationFacts.begin_time, ManipulationFacts.id]
+
+    seen = []
+    cursor = None
+    while True:
+        page = paginate(db_session, select(ManipulationFacts), keys, page_size=2, cursor=cursor)
+        seen.extend(fact.id for fact in page)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+
+    assert seen == [1, 2, 3, 4, 5, 6]
+
+
+def test_cursor_for_other_keys(db_session, pets):
+    cursor = encode_cursor([1, 2], 'next')
+
+    with pytest.raises(ValueError):
+        paginate(db_session, select(Pets), [Pets.id], cursor=cursor)
@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import OperationalError
+
+import src.maintenance.partitions as partitions
+from src.maintenance.partitions import (
+    DEFAULT_PARTITION, add_months, detach_partitions, ensure_partitions, list_partitions, maintain,
+    partition_name,
+)
+from src.models import ManipulationFacts, Manipulations, Pets
+
+
+class LockNotAvailable(Exception):
+    pgcode = '55P03'
+
+
+class FakeEngine:
+    """ Движок PostgreSQL, у которого первые locked попыток DETACH не дожидаются блокировки """
+
+    def __init__(self, locked: int):
+        self.locked = locked
+        self.executed = []
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    begin = connect
+
+    def exec_driver_sql(self, sql):
+        self.executed.append(sql)
+        if 'DETACH' in sql and self.locked:
+            self.locked -= 1
+            raise OperationalError(sql, {}, LockNotAvailable())
+
+
+def test_add_months():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert partition_name(date(2025, 6, 1)) == 'manipulation_facts_p2025_06'
+
+
+def test_maintain_does_nothing_without_partitioning(db_engine):
+    if db_engine.dialect.name == 'postgresql':
+        pytest.skip('SQLite-only')
+    assert maintain(engine=db_engine, retain_months=1) == {'created': [], 'detached': []}
+
+
+@pytest.fixture
+def old_partitions(monkeypatch):
+    months = {month: partition_name(month) for month in (date(2025, 1, 1), date(2025, 2, 1))}
+    monkeypatch.setattr(partitions, 'list_partitions', lambda connection: months)
+
+
+def test_detach_without_concurrently_retries_lock_timeout(old_partitions):
+    engine = FakeEngine(locked=2)
+
+    detached = detach_partitions(engine, date(2025, 2, 1), archive_schema=None, drop=True, delay=0)
+
+    assert detached == ['manipulation_facts_p2025_01']
+    # С DEFAULT-секцией CONCURRENTLY недоступен: обычный DETACH в транзакции с lock_timeout
+    assert engine.executed == [
+        "SET LOCAL lock_timeout = '3s'",
+        'ALTER TABLE manipulation_facts DETACH PARTITION manipulation_facts_p2025_01',
+    ] * 3 + ['DROP TABLE manipulation_facts_p2025_01']
+
+
+def test_detach_gives_up_after_attempts(old_partitions):
+    with pytest.raises(OperationalError):
+        detach_partitions(FakeEngine(locked=3), date(2025, 2, 1), attempts=3, delay=0)
+
+
+@pytest.fixture
+def partitioned(committed_engine):
+    if committed_engine.dialect.name != 'postgresql':
+        pytest.skip('manipulation_facts is partitioned on PostgreSQL only')
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Manipulations), [{'manipulation_id': 1, 'manipulation_name': 'Осмотр'}])
+        connection.execute(insert(Pets), [{'id': 1, 'name': 'Барсик'}])
+    return committed_engine
+
+
+def count(connection, table: str) -> int:
+    return connection.exec_driver_sql(f'SELECT count(*) FROM {table}').scalar()
+
+
+def test_month_moves_out_of_default_partition_and_detaches(partitioned):
+    month = date(2001, 1, 1)
+    name = partition_name(month)
+    with partitioned.begin() as connection:
+        connection.execute(insert(ManipulationFacts), [
+            {'pet_id': 1, 'manipulation_id': 1, 'begin_time': datetime(2001, 1, 15)},
+        ])
+        assert count(connection, DEFAULT_PARTITION) == 1
+
+        assert ensure_partitions(connection, month, add_months(month, 1)) == [name]
+        assert count(connection, DEFAULT_PARTITION) == 0
+        assert count(connection, name) == 1
+
+    # С DEFAULT-секцией DETACH ... CONCURRENTLY завершился бы ошибкой
+    assert detach_partitions(partitioned, add_months(month, 1), archive_schema=None, drop=True) == [name]
+    with partitioned.connect() as connection:
+        assert month not in list_partitions(connection)
+        assert connection.scalar(select(func.count()).select_from(ManipulationFacts)) == 0
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import select
+
+from src.models import Owners, Pets
+from src.queries.projection import fetch_rows, project, row_class, stream_rows
+
+
+@pytest.fixture
+def pets(db_session):
+    db_session.add(Owners(owner_id=1, owner_name='Иван'))
+    db_session.add_all(Pets(id=i, name=f'pet{i}', owner_id=1 if i % 2 else None, weight=i / 2) for i in range(1, 8))
+    db_session.flush()
+    db_session.expunge_all()
+
+
+def test_row_class_is_shared():
+    cls = row_class(Pets, ('id', 'name'))
+
+    assert cls is row_class(Pets, ('id', 'name'))
+    assert cls.__name__ == 'PetsRow'
+    assert cls.__slots__ == ()
+
+
+def test_project_keeps_criteria():
+    stmt, cls = project(select(Pets).where(Pets.weight > 1).order_by(Pets.id).limit(2), 'id', Pets.name)
+
+    assert cls._fields == ('id', 'name')
+    assert str(stmt) == str(select(Pets.id, Pets.name).where(Pets.weight > 1).order_by(Pets.id).limit(2))
+
+
+def test_fetch_rows_without_session_tracking(db_session, pets):
+    stmt = select(Pets).join(Pets.owner).where(Owners.owner_name == 'Иван').order_by(Pets.id.desc()).limit(3)
+
+    rows = fetch_rows(db_session, stmt)
+
+    assert [row.id for row in rows] == [7, 5, 3]
+    assert rows[0] == (7, None, 1, 'pet7', 'Male', 3.5, None)
+    assert rows[0]._fields == tuple(column.key for column in Pets.__table__.columns)
+    assert len(db_session.identity_map) == 0
+
+
+def test_stream_rows(db_connection, pets):
+    stmt = select(Pets).where(Pets.owner_id.is_(None)).order_by(Pets.id)
+
+    rows = list(stream_rows(db_connection, stmt, Pets.id, 'weight', size=2))
+
+    assert rows == [(2, 1.0), (4, 2.0), (6, 3.0)]
+    assert [row.weight for row in rows] == [1.0, 2.0, 3.0]
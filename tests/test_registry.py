@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import bindparam, select
+
+from src.models import Owners, Pets
+from src.queries.registry import QueryRegistry, registry, to_prepared
+
+
+class FakeCursor:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, sql, parameters=None):
+        self.executed.append((sql, parameters))
+
+
+def test_to_prepared():
+    sql = 'SELECT * FROM f WHERE pet_id = %(pet_id)s AND t >= %(since)s AND owner = %(pet_id)s AND name LIKE \'a%%\''
+
+    assert to_prepared(sql) == (
+        "SELECT * FROM f WHERE pet_id = $1 AND t >= $2 AND owner = $1 AND name LIKE 'a%'", ['pet_id', 'since'],
+    )
+
+
+@pytest.fixture
+def owners(db_session):
+    owner = Owners(owner_id=1, owner_name='owner1')
+    owner.pets = [Pets(id=i, name=f'pet{i}') for i in (1, 2)]
+    db_session.add(owner)
+    db_session.flush()
+    db_session.expunge_all()
+
+
+def test_execute_hits_compiled_cache(db_session, owners):
+    queries = QueryRegistry()
+    queries.register('pet_by_id', lambda: select(Pets).where(Pets.id == bindparam('pet_id')))
+
+    names = [queries.execute(db_session, 'pet_by_id', pet_id=pet_id).scalar_one().name for pet_id in (1, 2, 1)]
+
+    stats = queries.stats()['pet_by_id']
+    assert names == ['pet1', 'pet2', 'pet1']
+    assert stats['executions'] == 3
+    assert stats['cache_hits'] >= 2
+    assert stats['prepares'] == stats['prepared_executions'] == 0
+
+
+def test_eager_loads_are_not_counted(db_session, owners):
+    before = registry.stats()['owner_with_pets']['executions']
+
+    owner = registry.execute(db_session, 'owner_with_pets', owner_id=1).scalar_one()
+
+    # Питомцы загружены отдельным SELECT (selectin) с теми же execution_options
+    assert sorted(pet.name for pet in owner.pets) == ['pet1', 'pet2']
+    assert registry.stats()['owner_with_pets']['executions'] == before + 1
+
+
+def test_prepared_once_per_connection():
+    queries = QueryRegistry()
+    queries.register('pet_by_id', lambda: select(Pets).where(Pets.id == bindparam('pet_id')))
+    info = {}
+    context = SimpleNamespace(
+        execution_options=queries.execution_options('pet_by_id'),
+        invoked_statement=queries.statement('pet_by_id'),
+        root_connection=SimpleNamespace(connection=SimpleNamespace(info=info)),
+    )
+    statement = 'SELECT pets.id FROM pets WHERE pets.id = %(pet_id)s'
+    cursors = [FakeCursor(), FakeCursor()]
+
+    for cursor, pet_id in zip(cursors, (1, 2)):
+        assert queries._do_execute_prepared(cursor, statement, {'pet_id': pet_id}, context) is True
+
+    [(prepare, _), (execute, parameters)] = cursors[0].executed
+    assert prepare.startswith('PREPARE q_pet_by_id_') and prepare.endswith('AS SELECT pets.id FROM pets WHERE pets.id = $1')
+    assert (execute, parameters) == (f'EXECUTE {prepare.split()[1]} (%s)', [1])
+    assert cursors[1].executed == [(execute, [2])]
+    assert info['prepared_statements'] == {prepare.split()[1]}
+    assert (queries.stats()['pet_by_id']['prepares'], queries.stats()['pet_by_id']['prepared_executions']) == (1, 2)
+
+
+def test_other_statements_are_not_prepared():
+    context = SimpleNamespace(execution_options={}, invoked_statement=None)
+
+    assert registry._do_execute_prepared(FakeCursor(), 'SELECT 1', {}, context) is None
@@ -0,0 +1,91 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from src.models import ManipulationFacts, Manipulations, Pets, Species
+from src.reporting.rollups import materialized_view_sql, procedure_stats, refresh
+
+
+def add_facts(engine, *facts: tuple[int, datetime, int | None]) -> None:
+    """ facts - (питомец, начало, длительность в минутах или None для незавершённых) """
+
+    with engine.begin() as connection:
+        connection.execute(insert(ManipulationFacts), [
+            {'pet_id': pet_id, 'manipulation_id': 1, 'is_planned': minutes is None, 'begin_time': begin,
+             'end_time': None if minutes is None else begin.replace(minute=begin.minute + minutes)}
+            for pet_id, begin, minutes in facts
+        ])
+
+
+@pytest.fixture
+def clinic(committed_engine):
+    if committed_engine.dialect.name != 'sqlite':
+        # На PostgreSQL граница агрегатов - CURRENT_DATE сервера, а не today
+        pytest.skip('refresh(today=...) is SQLite-only')
+    with committed_engine.begin() as connection:
+        connection.execute(insert(Species), [{'species_id': 1, 'species_name': 'Кошка'}])
+        connection.execute(insert(Manipulations), [{'manipulation_id': 1, 'manipulation_name': 'Осмотр'}])
+        connection.execute(insert(Pets), [
+            {'id': 1, 'name': 'Барсик', 'species': 1},
+            {'id': 2, 'name': 'Бобик', 'species': None},
+        ])
+    return committed_engine
+
+
+def test_stored_and_live_days_are_combined(clinic):
+    add_facts(
+        clinic,
+        (1, datetime(2025, 6, 1, 10), 30),
+        (2, datetime(2025, 6, 1, 11), 10),
+        (1, datetime(2025, 6, 2, 9), None),
+    )
+    assert refresh(engine=clinic, today=date(2025, 6, 3)) == date(2025, 6, 3)
+    # После refresh(): закрытые дни читаются из агрегатов, поэтому поздняя правка
+    # 1 июня в отчёт не попадает, а факты после границы считаются по живой таблице
+    add_facts(
+        clinic,
+        (1, datetime(2025, 6, 1, 12), 5),
+        (1, datetime(2025, 6, 3, 10), 20),
+        (2, datetime(2025, 6, 4, 10), None),
+    )
+
+    with Session(clinic) as session:
+        by_day = procedure_stats(session, 'day', date(2025, 6, 1), date(2025, 6, 5))
+        by_species = procedure_stats(session, 'species', date(2025, 6, 2), date(2025, 6, 5))
+
+    assert {day: stats['facts'] for day, stats in by_day.items()} == {
+        date(2025, 6, 1): 2, date(2025, 6, 2): 1, date(2025, 6, 3): 1, date(2025, 6, 4): 1,
+    }
+    assert by_day[date(2025, 6, 1)]['duration_seconds'] == pytest.approx(40 * 60)
+    assert by_day[date(2025, 6, 1)]['avg_duration_seconds'] == pytest.approx(20 * 60)
+    assert by_day[date(2025, 6, 2)]['avg_duration_seconds'] is None
+    assert by_day[date(2025, 6, 4)]['planned'] == 1
+    # 2 июня из агрегатов, 3 и 4 - из живой таблицы; вид 0 - вид не указан
+    assert {species: stats['facts'] for species, stats in by_species.items()} == {1: 2, 0: 1}
+
+
+def test_without_refresh_everything_is_live(clinic):
+    add_facts(clinic, (1, datetime(2025, 6, 1, 10), 30), (2, datetime(2025, 6, 2, 10), 15))
+
+    with Session(clinic) as session:
+        stats = procedure_stats(session, 'manipulation', date(2025, 6, 1), date(2025, 6, 3))
+
+    assert stats[1]['facts'] == 2
+    assert stats[1]['finished'] == 2
+    assert stats[1]['duration_seconds'] == pytest.approx(45 * 60)
+
+
+def test_unknown_grouping(db_session):
+    with pytest.raises(ValueError):
+        procedure_stats(db_session, 'owner', date(2025, 6, 1), date(2025, 6, 2))
+
+
+def test_postgresql_duration_is_float():
+    # EXTRACT(epoch ...) на PostgreSQL 14+ - numeric: без приведения живая часть отчёта
+    # возвращала бы Decimal, который не складывается с float из агрегатов
+    sql = materialized_view_sql(postgresql.dialect())
+
+    assert 'CAST(EXTRACT(epoch FROM manipulation_facts.end_time - manipulation_facts.begin_time) AS FLOAT)' in sql
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import select, text
+
+import src.config.session as session_module
+from src.config.engine import build_engine
+from src.config.session import BatchingSession, ReplicaRouter, RoutingSession
+from src.models import Base, Owners
+
+
+@pytest.fixture
+def replica():
+    engine = build_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ Управляемые часы для окна read-your-writes """
+
+    now = [1000.0]
+    monkeypatch.setattr(session_module, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def router(committed_engine, replica, clock):
+    return ReplicaRouter(committed_engine, [replica], sticky_seconds=5)
+
+
+def bind_of(session: RoutingSession, clause) -> str:
+    return 'primary' if session.get_bind(clause=clause) is session.router.primary else 'replica'
+
+
+def test_reads_go_to_replica(router):
+    with RoutingSession(router=router) as session:
+        assert bind_of(session, select(Owners)) == 'replica'
+        assert bind_of(session, select(Owners).with_for_update()) == 'primary'
+        # После первого обращения к основному серверу сессия на реплику не возвращается
+        assert bind_of(session, select(Owners)) == 'primary'
+
+
+def test_write_session(router):
+    with RoutingSession(router=router, write=True) as session:
+        assert bind_of(session, select(Owners)) == 'primary'
+
+
+@pytest.mark.parametrize('clause', [text("UPDATE owners SET owner_name = 'x'"), text('SELECT 1'), None])
+def test_text_and_bare_connection_go_to_primary(router, clause):
+    with RoutingSession(router=router) as session:
+        assert bind_of(session, clause) == 'primary'
+
+
+def test_reads_stick_to_primary_after_commit(router, clock):
+    with RoutingSession(router=router) as session:
+        session.add(Owners(owner_name='Иванов'))
+        session.commit()
+
+    # Реплика могла ещё не получить запись: sticky_seconds чтение идёт на основной сервер
+    clock[0] += 4
+    with RoutingSession(router=router) as session:
+        assert session.scalars(select(Owners.owner_name)).all() == ['Иванов']
+
+    clock[0] += 2
+    with RoutingSession(router=router) as session:
+        assert bind_of(session, select(Owners)) == 'replica'
+
+
+def test_read_only_commit_does_not_stick(router):
+    with RoutingSession(router=router) as session:
+        session.scalars(select(Owners)).all()
+        session.execute(text('SELECT 1'))
+        session.commit()
+
+    with RoutingSession(router=router) as session:
+        assert bind_of(session, select(Owners)) == 'replica'
+
+
+def test_batching_session_flushes_updates(db_connection):
+    db_connection.execute(Owners.__table__.insert(), [{'owner_id': i, 'owner_name': 'old'} for i in range(1, 8)])
+    flushes = []
+
+    with BatchingSession(bind=db_connection, join_transaction_mode='create_savepoint',
+                         max_batch=3, flush_interval=None) as session:
+        owners = session.scalars(select(Owners)).all()
+        original_flush = session.flush
+        session.flush = lambda objects=None: (flushes.append(len(session.dirty)), original_flush(objects))
+        for owner in owners:
+            owner.owner_name = 'new'
+
+        # Каждый третий изменённый объект сбрасывает пачку, не дожидаясь commit
+        assert flushes == [3, 3]
+        assert len(session.dirty) == 1
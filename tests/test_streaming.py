@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.engine import Row
+
+from src.models import Pets
+from src.queries.streaming import selects_single_entity, stream, stream_partitions
+
+
+@pytest.fixture
+def pets(db_session):
+    db_session.add_all(Pets(id=i, name=f'pet{i}') for i in range(1, 11))
+    db_session.flush()
+    db_session.expunge_all()
+
+
+def test_selects_single_entity():
+    assert selects_single_entity(select(Pets))
+    assert not selects_single_entity(select(Pets.id))
+    assert not selects_single_entity(select(Pets, Pets.name))
+
+
+def test_partitions_use_server_side_cursor(db_session, db_connection, pets):
+    options = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        options.append(context.execution_options)
+
+    event.listen(db_connection, 'before_cursor_execute', record)
+    try:
+        partitions = list(stream_partitions(db_session, select(Pets).order_by(Pets.id), size=4))
+    finally:
+        event.remove(db_connection, 'before_cursor_execute', record)
+
+    assert [[pet.id for pet in partition] for partition in partitions] == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    assert all(isinstance(pet, Pets) for partition in partitions for pet in partition)
+    assert options[0]['stream_results'] and options[0]['yield_per'] == 4
+
+
+def test_rows_for_columns(db_session, pets):
+    rows = list(stream(db_session, select(Pets.id, Pets.name).order_by(Pets.id), size=3))
+
+    assert all(isinstance(row, Row) for row in rows)
+    assert [tuple(row) for row in rows[:2]] == [(1, 'pet1'), (2, 'pet2')]
+    assert len(rows) == 10
+
+
+@pytest.mark.parametrize('expunge', [True, False])
+def test_expunge_detaches_processed_partitions(db_session, pets, expunge):
+    # Партиции удерживаются тестом: без expunge все объекты остались бы в identity map
+    partitions = []
+    for partition in stream_partitions(db_session, select(Pets).order_by(Pets.id), size=3, expunge=expunge):
+        assert all(pet in db_session for pet in partition)
+        partitions.append(partition)
+
+    assert [len(partition) for partition in partitions] == [3, 3, 3, 1]
+    assert len(db_session.identity_map) == (0 if expunge else 10)
+    assert all((pet not in db_session) == expunge for partition in partitions for pet in partition)